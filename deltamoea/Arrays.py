@@ -0,0 +1,446 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+"""
+Array-backed archive storage.  Each ArrayRank keeps its
+individuals in contiguous numpy arrays, one row per slot,
+instead of in a list of ArchiveIndividual namedtuples.
+This is much closer to the C layout described in the
+technotes, and it is cheap to allocate because unused
+rows are never touched.
+
+numpy is only required if ARRAYS storage is requested.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .Constants import RETAIN
+
+from .Structures import ArrayRank
+from .Structures import ArchiveIndividual
+
+from .Slots import occupy_slot
+from .Slots import vacate_slot
+
+def empty_array_rank(problem, float_values, grid, ranksize):
+    """
+    problem (Problem)
+    float_values (RETAIN or DISCARD)
+    grid (Grid): used to size the grid point index type
+    ranksize (int): number of slots in the rank
+
+    Returns an ArrayRank with no valid individuals.
+    """
+    if numpy is None:
+        raise Exception("ARRAYS archive storage requires numpy.")
+    ndv = len(problem.decisions)
+    # The smallest integer type that can hold every grid index.
+    # For typical grids this is a uint8 or uint16.
+    largest_index = max([len(a) - 1 for a in grid.axes] + [0])
+    index_type = numpy.min_scalar_type(largest_index)
+    slot_type = numpy.min_scalar_type(ranksize)
+    if float_values == RETAIN:
+        ndecisions = ndv
+    else:
+        ndecisions = 0
+    # numpy.zeros leaves the pages untouched until they are written,
+    # so an empty rank costs almost nothing.  Slot contents are
+    # meaningless unless the valid flag is set, so unlike the list
+    # storage we don't need bogus individuals.
+    return ArrayRank(
+        numpy.zeros(ranksize, dtype=bool),
+        numpy.zeros((ranksize, ndv), dtype=index_type),
+        numpy.zeros((ranksize, ndecisions)),
+        numpy.zeros((ranksize, len(problem.objectives))),
+        numpy.zeros((ranksize, len(problem.constraints))),
+        numpy.zeros((ranksize, len(problem.tagalongs))),
+        0,
+        numpy.arange(ranksize, dtype=slot_type),
+        numpy.arange(ranksize, dtype=slot_type))
+
+def memmap_array_rank(problem, float_values, grid, ranksize, path):
+    """
+    problem (Problem)
+    float_values (RETAIN or DISCARD)
+    grid (Grid): used to size the grid point index type
+    ranksize (int): number of slots in the rank
+    path (str): file to keep the rank in.  It is created, or
+                overwritten if it exists.
+
+    Returns an ArrayRank with no valid individuals, whose
+    arrays are views of one numpy.memmap.  The file holds one
+    fixed-size record per slot: the valid flag, grid point,
+    decisions, objectives, constraints, and tagalongs.  The
+    views behave like any other numpy arrays, so the rank is
+    sorted and sampled in place, and the operating system
+    pages records in and out as they're used.  The slot
+    permutation is small, so it stays in memory.
+    """
+    if numpy is None:
+        raise Exception("MEMMAP archive storage requires numpy.")
+    ndv = len(problem.decisions)
+    largest_index = max([len(a) - 1 for a in grid.axes] + [0])
+    index_type = numpy.min_scalar_type(largest_index)
+    slot_type = numpy.min_scalar_type(ranksize)
+    if float_values == RETAIN:
+        ndecisions = ndv
+    else:
+        ndecisions = 0
+    record = numpy.dtype([
+        ("valid", bool),
+        ("grid_point", index_type, (ndv,)),
+        ("decisions", float, (ndecisions,)),
+        ("objectives", float, (len(problem.objectives),)),
+        ("constraints", float, (len(problem.constraints),)),
+        ("tagalongs", float, (len(problem.tagalongs),)),
+    ], align=True)
+    # A new file is sparse, so like numpy.zeros, this costs
+    # nothing until records are written.
+    records = numpy.memmap(path, dtype=record, mode="w+", shape=(ranksize,))
+    return ArrayRank(
+        records["valid"],
+        records["grid_point"],
+        records["decisions"],
+        records["objectives"],
+        records["constraints"],
+        records["tagalongs"],
+        0,
+        numpy.arange(ranksize, dtype=slot_type),
+        numpy.arange(ranksize, dtype=slot_type))
+
+def is_memmap_rank(rank):
+    """
+    Returns True if the rank is kept in a memory-mapped file.
+    """
+    return (isinstance(rank, ArrayRank)
+            and isinstance(rank.valid, numpy.memmap))
+
+def grow_array_rank(rank, capacity):
+    """
+    rank (ArrayRank)
+    capacity (int): new number of slots, no less than the old
+
+    Returns a larger copy of the rank.  The new slots go on
+    the bottom of its free-slot stack.
+    """
+    old_capacity = len(rank.valid)
+    def grown(old):
+        new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+        new[:old_capacity] = old
+        return new
+    slot_type = numpy.min_scalar_type(capacity)
+    slots = numpy.arange(capacity, dtype=slot_type)
+    slots[:old_capacity] = rank.slots
+    positions = numpy.arange(capacity, dtype=slot_type)
+    positions[:old_capacity] = rank.positions
+    return ArrayRank(
+        grown(rank.valid),
+        grown(rank.grid_points),
+        grown(rank.decisions),
+        grown(rank.objectives),
+        grown(rank.constraints),
+        grown(rank.tagalongs),
+        rank.occupancy,
+        slots,
+        positions)
+
+def clear_array_rank(rank):
+    """
+    Returns the rank with every slot invalidated.
+    """
+    rank.valid[rank.slots[:rank.occupancy]] = False
+    return rank._replace(occupancy=0)
+
+def valid_array_indices(rank):
+    """
+    Returns a list of the indices of the valid slots in a rank.
+    It's a copy, so it's safe to keep using while the rank
+    changes.
+    """
+    return rank.slots[:rank.occupancy].tolist()
+
+def array_rank_individual(rank, index):
+    """
+    Returns the ArchiveIndividual stored in slot 'index'.
+    """
+    return ArchiveIndividual(
+        bool(rank.valid[index]),
+        tuple(rank.grid_points[index].tolist()),
+        tuple(rank.decisions[index].tolist()),
+        tuple(rank.objectives[index].tolist()),
+        tuple(rank.constraints[index].tolist()),
+        tuple(rank.tagalongs[index].tolist()))
+
+def store_array_individual(rank, archive_individual):
+    """
+    Write a valid ArchiveIndividual into the next free slot.
+
+    Returns the updated rank.
+    """
+    index = rank.slots[rank.occupancy]
+    rank.valid[index] = True
+    rank.grid_points[index] = archive_individual.grid_point
+    rank.decisions[index] = archive_individual.decisions
+    rank.objectives[index] = archive_individual.objectives
+    rank.constraints[index] = archive_individual.constraints
+    rank.tagalongs[index] = archive_individual.tagalongs
+    # The top of the free stack is already at the boundary.
+    return rank._replace(occupancy=rank.occupancy + 1)
+
+def move_array_individual(destination_rank, destination_index,
+                          source_rank, source_index):
+    """
+    ArrayRank version of Sorting.move_individual.  Same
+    lack of guarantees.
+
+    Returns an updated destination rank and source rank.
+    """
+    destination_rank.valid[destination_index] = True
+    destination_rank.grid_points[destination_index] = \
+        source_rank.grid_points[source_index]
+    destination_rank.decisions[destination_index] = \
+        source_rank.decisions[source_index]
+    destination_rank.objectives[destination_index] = \
+        source_rank.objectives[source_index]
+    destination_rank.constraints[destination_index] = \
+        source_rank.constraints[source_index]
+    destination_rank.tagalongs[destination_index] = \
+        source_rank.tagalongs[source_index]
+    destination_rank = destination_rank._replace(occupancy=occupy_slot(
+        destination_rank.slots,
+        destination_rank.positions,
+        destination_rank.occupancy,
+        destination_index))
+    source_rank.valid[source_index] = False
+    source_rank = source_rank._replace(occupancy=vacate_slot(
+        source_rank.slots,
+        source_rank.positions,
+        source_rank.occupancy,
+        source_index))
+    return destination_rank, source_rank
+
+def fill_array_rank_from_rank(destination, source):
+    """
+    ArrayRank version of Sorting.fill_rank_from_rank.
+    Moves valid individuals from source into the free slots
+    of destination until either the source is empty or the
+    destination is full.  This is done with one fancy-indexed
+    copy per array rather than one move per individual.
+
+    Returns an updated destination rank and source rank.
+    """
+    count = min(source.occupancy, len(destination.valid) - destination.occupancy)
+    if count == 0:
+        return destination, source
+    # Take individuals off the end of the source's valid slots and
+    # put them on top of the destination's free slots, in the same
+    # order as Sorting.fill_rank_from_rank.  Neither rank's slot
+    # permutation needs to change: only the boundaries move.
+    source_indices = source.slots[
+        source.occupancy - count:source.occupancy][::-1]
+    destination_indices = destination.slots[
+        destination.occupancy:destination.occupancy + count]
+    destination.valid[destination_indices] = True
+    destination.grid_points[destination_indices] = \
+        source.grid_points[source_indices]
+    destination.decisions[destination_indices] = \
+        source.decisions[source_indices]
+    destination.objectives[destination_indices] = \
+        source.objectives[source_indices]
+    destination.constraints[destination_indices] = \
+        source.constraints[source_indices]
+    destination.tagalongs[destination_indices] = \
+        source.tagalongs[source_indices]
+    source.valid[source_indices] = False
+    destination = destination._replace(
+        occupancy=destination.occupancy + count)
+    source = source._replace(occupancy=source.occupancy - count)
+    return destination, source
+
+def dominance_masks(objectives, constraints, grid_point,
+                    rank_objectives, rank_constraints, rank_grid_points):
+    """
+    objectives (float array): candidate objectives, minimized
+    constraints (float array): candidate constraints, minimized
+    grid_point (int array): candidate grid point
+    rank_objectives (float matrix): one row per individual
+    rank_constraints (float matrix): one row per individual
+    rank_grid_points (int matrix): one row per individual
+
+    Vectorized Sorting._compare with the candidate on the left
+    and every row on the right.  The candidate arguments may
+    carry leading axes (e.g. one candidate per row of a
+    column-shaped stack) and broadcast against the rows.
+
+    Returns two bool arrays, (dominated, dominating): rows that
+    the candidate dominates, and rows that dominate the
+    candidate.  They are never both true for the same row.
+    """
+    objectives = numpy.asarray(objectives, dtype=float)
+    constraints = numpy.asarray(constraints, dtype=float)
+    # Objectives only matter if constraints are a tie.
+    left_o = (~numpy.isnan(objectives)
+              & ~(objectives > rank_objectives)).all(axis=-1)
+    right_o = (~numpy.isnan(rank_objectives)
+               & ~(rank_objectives > objectives)).all(axis=-1)
+    # Oversampled, nondominated individuals: the candidate wins.
+    same_point = (rank_grid_points == grid_point).all(axis=-1)
+    dominated = left_o & (~right_o | same_point)
+    dominating = right_o & ~left_o
+    if rank_constraints.shape[-1] == 0:
+        return dominated, dominating
+    # Constraints come first.  We are indifferent to a constraint
+    # when both sides are at or below zero.  NaN is never <= 0,
+    # so a NaN constraint is always considered, and it
+    # disqualifies its own side from dominating.
+    considered = ~(constraints <= 0) | ~(rank_constraints <= 0)
+    left_c = (~considered | (
+        ~numpy.isnan(constraints) & ~(constraints > rank_constraints)
+    )).all(axis=-1)
+    right_c = (~considered | (
+        ~numpy.isnan(rank_constraints) & ~(rank_constraints > constraints)
+    )).all(axis=-1)
+    tied = left_c & right_c
+    dominated = (left_c & ~right_c) | (tied & dominated)
+    dominating = (right_c & ~left_c) | (tied & dominating)
+    return dominated, dominating
+
+def array_dominance(rank, objectives, constraints, grid_point):
+    """
+    rank (ArrayRank)
+    objectives, constraints, grid_point: the candidate, as in
+        dominance_masks
+
+    Compare a candidate against every valid individual in a
+    rank in one pass.
+
+    Returns (dominated, dominating) bool arrays over the slots of
+    the rank, both false for invalid slots.
+    """
+    dominated = numpy.zeros(len(rank.valid), dtype=bool)
+    dominating = numpy.zeros(len(rank.valid), dtype=bool)
+    members = rank.slots[:rank.occupancy]
+    if len(members) > 0:
+        dominated[members], dominating[members] = dominance_masks(
+            objectives, constraints, grid_point,
+            rank.objectives[members],
+            rank.constraints[members],
+            rank.grid_points[members])
+    return dominated, dominating
+
+def sort_array_individual(rank_A, ai, into, rank_B):
+    """
+    ArrayRank version of Sorting._sort_individual.  Compares
+    individual ai of rank A against all of "into" at once.
+
+    Returns updated rank A, "into", and rank B.
+    """
+    if into.occupancy == 0:
+        return rank_A, into, rank_B
+    # Only compare against the valid rows, in the same order
+    # the scalar loop would visit them.
+    members = into.slots[:into.occupancy]
+    dominated, dominating = dominance_masks(
+        rank_A.objectives[ai],
+        rank_A.constraints[ai],
+        rank_A.grid_points[ai],
+        into.objectives[members],
+        into.constraints[members],
+        into.grid_points[members])
+    is_dominated = dominating.any()
+    if is_dominated:
+        # The scalar loop stops at the first individual that
+        # dominates the candidate, so nothing after that gets
+        # displaced.
+        dominated[dominating.argmax():] = False
+    for ii in members[dominated].tolist():
+        rank_B, into = move_array_individual(
+            rank_B, rank_B.slots[rank_B.occupancy], into, ii)
+    if is_dominated:
+        rank_B, rank_A = move_array_individual(
+            rank_B, rank_B.slots[rank_B.occupancy], rank_A, ai)
+    return rank_A, into, rank_B
+
+def array_nondominated_fronts(objectives, constraints, grid_points):
+    """
+    objectives (float matrix): one row per individual, minimized
+    constraints (float matrix): one row per individual, minimized
+    grid_points (int matrix): one row per individual
+
+    Vectorized Sorting.nondominated_fronts: builds the whole
+    dominance matrix in one broadcast comparison and peels
+    fronts off it by counting how many remaining individuals
+    dominate each one.
+
+    Returns a list of fronts, best first.  Each front is a
+    list of row indices.
+    """
+    count = len(grid_points)
+    objectives = numpy.asarray(objectives, dtype=float).reshape(count, -1)
+    constraints = numpy.asarray(constraints, dtype=float).reshape(count, -1)
+    grid_points = numpy.asarray(grid_points).reshape(count, -1)
+    # dominates[ii, jj]: individual ii dominates individual jj
+    dominates, _ = dominance_masks(
+        objectives[:, None, :],
+        constraints[:, None, :],
+        grid_points[:, None, :],
+        objectives,
+        constraints,
+        grid_points)
+    # Nondominated individuals at the same grid point each claim
+    # to dominate the other.  The later one wins.
+    earlier = numpy.triu(numpy.ones((count, count), dtype=bool), 1)
+    dominates &= ~(dominates.T & earlier)
+    # Everybody "dominates" themselves by the same rule.
+    numpy.fill_diagonal(dominates, False)
+    dominated_by = dominates.sum(axis=0)
+    remaining = numpy.ones(count, dtype=bool)
+    fronts = list()
+    while remaining.any():
+        front = numpy.flatnonzero(remaining & (dominated_by == 0))
+        if len(front) == 0:
+            # Tie-breaking can make dominance cyclic in
+            # pathological cases.  Don't lose anybody if it does.
+            front = numpy.flatnonzero(remaining)
+        fronts.append(front.tolist())
+        remaining[front] = False
+        dominated_by -= dominates[front].sum(axis=0)
+    return fronts
@@ -0,0 +1,132 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+An asyncio driver for the main loop, for problems where
+evaluations are slow I/O-bound calls rather than
+computations.  Requires Python 3.5 or later.
+"""
+
+import asyncio
+
+from .Functions import get_sample
+from .Functions import return_evaluated_individual
+
+from .Sampling import NearExhaustionWarning
+from .Sampling import TotalExhaustionError
+
+async def optimize_async(state, evaluate, evaluations, concurrency):
+    """
+    state (MOEAState): current algorithm state
+    evaluate (coroutine function): takes a sample from get_sample
+                     and returns an evaluated Individual
+    evaluations (int): number of samples to evaluate
+    concurrency (int): maximum number of evaluations in flight
+                     at once
+
+    Keeps up to concurrency evaluations running, returning each
+    Individual to the archive as soon as its evaluation
+    completes and issuing a new sample in its place.
+
+    concurrency may be no larger than the ring of issued
+    samples (ranksize).  Even then, a slow evaluation can be
+    overtaken by enough fast ones that the ring comes back
+    around to it, so no new sample is issued while the next
+    slot in the ring holds one that is still in flight.  The
+    outstanding samples are never overwritten.
+
+    A NearExhaustionWarning is ignored, since get_sample carries
+    on with an exhaustive sweep after it.  After a
+    TotalExhaustionError no more samples are issued, but the
+    ones in flight are still returned.  If an evaluation raises
+    an exception, the other evaluations are cancelled and the
+    exception propagates.
+
+    Returns the final MOEAState.
+    """
+    if concurrency < 1:
+        raise Exception("Concurrency {} is less than 1.".format(concurrency))
+    if concurrency > len(state.issued.issues):
+        raise Exception(
+            "Concurrency {} is more than the {} outstanding samples "
+            "the state can track.".format(
+                concurrency, len(state.issued.issues)))
+    pending = set()
+    done = set()
+    issued = 0
+    exhausted = False
+    try:
+        while True:
+            while (not exhausted and issued < evaluations
+                   and len(pending) < concurrency
+                   and not (pending and _next_issue_outstanding(state))):
+                try:
+                    state, sample = get_sample(state)
+                except NearExhaustionWarning as ew:
+                    state = ew.state
+                    continue
+                except TotalExhaustionError as te:
+                    state = te.state
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(evaluate(sample)))
+                issued += 1
+            if not pending:
+                break
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                state = return_evaluated_individual(state, task.result())
+    finally:
+        for task in pending | done:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Retrieve any other failures so that asyncio
+                # doesn't complain about them.
+                task.exception()
+    return state
+
+def _next_issue_outstanding(state):
+    """
+    state (MOEAState)
+
+    Returns True if the next sample issued would overwrite
+    an outstanding one in the ring of issued samples.
+    """
+    issued = state.issued
+    return issued.issues[issued.index].outstanding
@@ -0,0 +1,498 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Binary checkpoints of an MOEAState.
+
+An MOEAState can't be pickled reliably: its grid holds
+namedtuple types made up at run time, and its random number
+generators are arbitrary callables.  save_state writes
+everything needed to carry on instead, and load_state
+rebuilds the grid and its types from the problem definition.
+
+A checkpoint is:
+
+    8 bytes     magic, b"DMOEACKP"
+    uint32      format version
+    uint64      length of the header
+    header      UTF-8 JSON: the problem, settings, rank sizes,
+                DOE state, ring position, and RNG state
+    sections    each a uint64 length and then the bytes
+
+All numbers are little-endian.  The sections are, in order:
+for each archive rank, the grid points (uint32), decisions,
+objectives, constraints, and tagalongs (doubles) of its
+individuals in slot order; the archive set; the issued ring's
+keys and outstanding flags; the issued set; the issue index's
+keys and ring indices; and, if the state tracks coverage, one
+section per coverage chunk.  Grid point keys are stored as
+key_limbs uint64s each, least significant first, and ring
+keys are stored plus one so that empty entries (-1) fit.
+
+Tagalongs must be numbers to be saved.
+"""
+
+import json
+import os
+
+from struct import pack
+from struct import unpack
+from struct import unpack_from
+from struct import calcsize
+
+from itertools import chain
+from itertools import repeat
+
+from random import Random
+from random import random
+from random import randint
+from random import getstate
+from random import setstate
+
+from .Constants import LISTS
+from .Constants import ARRAYS
+from .Constants import MEMMAP
+
+from .Structures import Decision
+from .Structures import Objective
+from .Structures import Constraint
+from .Structures import Tagalong
+from .Structures import Problem
+from .Structures import ArchiveIndividual
+from .Structures import ArrayRank
+from .Structures import DOEState
+from .Structures import Permutation
+from .Structures import Issue
+from .Structures import Issued
+from .Structures import MOEAState
+
+from .Functions import _create_grid
+from .Functions import _rank_factory
+
+from .Sorting import rank_capacity
+from .Sorting import _archive_stats
+
+from .Arrays import is_memmap_rank
+from .Arrays import numpy
+
+from .Coverage import CHUNK_BITS
+from .Coverage import FULL
+from .Coverage import new_coverage
+
+from .Generators import BufferedRNG
+
+MAGIC = b"DMOEACKP"
+VERSION = 1
+
+_MASK_64 = (1 << 64) - 1
+
+def save_state(state, path):
+    """
+    state (MOEAState): the state to save.  (For an Optimizer,
+                     save optimizer.to_state().)
+    path (str): file to write
+
+    Writes a checkpoint of the state to path.  The checkpoint
+    is written to a temporary file first and then renamed, so
+    a crash partway through leaves any earlier checkpoint at
+    path intact.
+
+    The state of the random number generators is saved if
+    they are the random and randint methods of one
+    random.Random (including the random module's own) or one
+    BufferedRNG.  Otherwise load_state has to be given new
+    ones.
+    """
+    problem = state.problem
+    grid = state.grid
+    total_points = grid.strides[-1] * len(grid.axes[-1])
+    key_limbs = max(1, (total_points.bit_length() + 63) // 64)
+    archive = state.archive
+    resident_ranks = len(archive)
+    if is_memmap_rank(archive[-1]):
+        storage = MEMMAP
+        resident_ranks = len(
+            [rank for rank in archive if not is_memmap_rank(rank)])
+    elif isinstance(archive[0], ArrayRank):
+        storage = ARRAYS
+    else:
+        storage = LISTS
+
+    sections = list()
+    for rank in archive:
+        sections.extend(_pack_rank(rank))
+    sections.append(_pack_keys(state.archive_set, key_limbs))
+    issued = state.issued
+    sections.append(_pack_keys(
+        [issue.key + 1 for issue in issued.issues], key_limbs))
+    sections.append(bytes(bytearray(
+        [1 if issue.outstanding else 0 for issue in issued.issues])))
+    sections.append(_pack_keys(issued.issued_set, key_limbs))
+    issue_index = list(issued.issue_index.items())
+    sections.append(_pack_keys([key for key, _ in issue_index], key_limbs))
+    sections.append(pack("<{}Q".format(len(issue_index)),
+                         *(index for _, index in issue_index)))
+    if state.coverage is not None:
+        for chunk in state.coverage.chunks:
+            if chunk is None:
+                sections.append(b"")
+            elif chunk is FULL:
+                sections.append(b"F")
+            else:
+                sections.append(bytes(chunk))
+
+    doestate = state.doestate
+    if doestate.permutation is None:
+        permutation = None
+    else:
+        permutation = [doestate.permutation.half_bits,
+                       list(doestate.permutation.keys)]
+    header = {
+        "problem": {
+            "decisions": [list(d) for d in problem.decisions],
+            "objectives": [list(o) for o in problem.objectives],
+            "constraints": [list(c) for c in problem.constraints],
+            "tagalongs": [t.name for t in problem.tagalongs],
+        },
+        "float_values": state.float_values,
+        "ranksize": state.ranksize,
+        "distribution_index": state.distribution_index,
+        "storage": storage,
+        "resident_ranks": resident_ranks,
+        "ranks": [[rank_capacity(rank), rank.occupancy]
+                  for rank in archive],
+        "scratch_capacities": [rank_capacity(state.rank_A),
+                               rank_capacity(state.rank_B)],
+        "key_limbs": key_limbs,
+        "issued_index": issued.index,
+        "doestate": {
+            "stage": doestate.stage,
+            "terminate": doestate.terminate,
+            "counter": doestate.counter,
+            "remaining": doestate.remaining,
+            "permutation": permutation,
+        },
+        "rng": _rng_state(state),
+        "coverage": state.coverage is not None,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(pack("<IQ", VERSION, len(header_bytes)))
+        fp.write(header_bytes)
+        for section in sections:
+            fp.write(pack("<Q", len(section)))
+            fp.write(section)
+    # os.replace is atomic even on Windows, but Python 2 lacks it.
+    getattr(os, "replace", os.rename)(temporary_path, path)
+
+def load_state(path, **kwargs):
+    """
+    path (str): a checkpoint written by save_state
+
+    keywords:
+        random (callable): a real-number generating function,
+                     as for create_moea_state.  Required if the
+                     checkpoint doesn't include the generator's
+                     state; otherwise it replaces the restored
+                     generator.
+        randint (callable): an integer generating function,
+                     as for create_moea_state.  Same conditions
+                     as random.
+        directory (str): for a state with MEMMAP storage, the
+                     directory for the restored rank files, as
+                     for create_moea_state.  Rank files already
+                     there are overwritten.  (default: a new
+                     temporary directory)
+
+    Returns the MOEAState saved in the checkpoint.  If the
+    saved state used the random module's own generator, that
+    generator is restored to the saved state.
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise Exception("{} is not a deltamoea checkpoint.".format(path))
+    offset = len(MAGIC)
+    version, header_length = unpack_from("<IQ", data, offset)
+    if version != VERSION:
+        raise Exception(
+            "Checkpoint version {} is not supported.".format(version))
+    offset += 12
+    header = json.loads(data[offset:offset + header_length].decode("utf-8"))
+    offset += header_length
+    sections = _Sections(data, offset)
+
+    definition = header["problem"]
+    problem = Problem(
+        tuple(Decision(*d) for d in definition["decisions"]),
+        tuple(Objective(*o) for o in definition["objectives"]),
+        tuple(Constraint(*c) for c in definition["constraints"]),
+        tuple(Tagalong(t) for t in definition["tagalongs"]))
+    float_values = header["float_values"]
+    grid = _create_grid(problem.decisions)
+    key_limbs = header["key_limbs"]
+
+    new_rank = _rank_factory(
+        problem, float_values, grid, header["storage"],
+        directory=kwargs.get("directory", None),
+        resident_ranks=header["resident_ranks"])
+    archive = list()
+    for ii, (capacity, occupancy) in enumerate(header["ranks"]):
+        archive.append(_unpack_rank(
+            new_rank(capacity, ii), occupancy, grid, sections))
+    rank_A, rank_B = (new_rank(c) for c in header["scratch_capacities"])
+
+    archive_set = set(_unpack_keys(sections.next(), key_limbs))
+    ring_keys = _unpack_keys(sections.next(), key_limbs)
+    outstanding = bytearray(sections.next())
+    issues = [Issue(key - 1, flag == 1)
+              for key, flag in zip(ring_keys, outstanding)]
+    issued_set = set(_unpack_keys(sections.next(), key_limbs))
+    index_keys = _unpack_keys(sections.next(), key_limbs)
+    index_data = sections.next()
+    indices = unpack("<{}Q".format(len(index_data) // 8), index_data)
+    issued = Issued(
+        issues, header["issued_index"], issued_set,
+        dict(zip(index_keys, indices)))
+
+    if header["coverage"]:
+        coverage = new_coverage(grid.strides[-1] * len(grid.axes[-1]))
+        for ii in range(len(coverage.chunks)):
+            chunk = sections.next()
+            if chunk == b"F":
+                coverage.chunks[ii] = FULL
+                coverage.counts[ii] = _chunk_bits(coverage, ii)
+            elif chunk:
+                chunk = bytearray(chunk)
+                coverage.chunks[ii] = chunk
+                coverage.counts[ii] = sum(
+                    bin(byte).count("1") for byte in chunk)
+    else:
+        coverage = None
+
+    saved = header["doestate"]
+    if saved["permutation"] is None:
+        permutation = None
+    else:
+        half_bits, keys = saved["permutation"]
+        permutation = Permutation(half_bits, tuple(keys))
+    doestate = DOEState(
+        saved["stage"], saved["terminate"], saved["counter"],
+        saved["remaining"], permutation)
+
+    _random, _randint = _restore_rng(header["rng"])
+    _random = kwargs.get("random", _random)
+    _randint = kwargs.get("randint", _randint)
+    if _random is None or _randint is None:
+        raise Exception(
+            "The checkpoint doesn't include the random number "
+            "generators' state, so random and randint are required.")
+
+    return MOEAState(
+        problem,
+        float_values,
+        grid,
+        archive,
+        header["ranksize"],
+        archive_set,
+        _archive_stats(archive),
+        rank_A,
+        rank_B,
+        issued,
+        _random,
+        _randint,
+        header["distribution_index"],
+        doestate,
+        dict(), # selection_tables for Python acceleration
+        coverage)
+
+class _Sections(object):
+    """
+    Reads length-prefixed sections from a checkpoint in order.
+    """
+    def __init__(self, data, offset):
+        self.data = data
+        self.offset = offset
+
+    def next(self):
+        length, = unpack_from("<Q", self.data, self.offset)
+        start = self.offset + 8
+        self.offset = start + length
+        return self.data[start:self.offset]
+
+def _chunk_bits(coverage, chunk_index):
+    """
+    Returns the number of grid points in a coverage chunk.
+    """
+    start = chunk_index * CHUNK_BITS
+    return min(CHUNK_BITS, coverage.total_points - start)
+
+def _pack_keys(keys, key_limbs):
+    """
+    Returns grid point keys packed as key_limbs uint64s each.
+    """
+    keys = list(keys)
+    if key_limbs == 1:
+        return pack("<{}Q".format(len(keys)), *keys)
+    limbs = [(key >> (64 * ii)) & _MASK_64
+             for key in keys for ii in range(key_limbs)]
+    return pack("<{}Q".format(len(limbs)), *limbs)
+
+def _unpack_keys(data, key_limbs):
+    """
+    Returns a list of grid point keys packed by _pack_keys.
+    """
+    limbs = unpack("<{}Q".format(len(data) // 8), data)
+    if key_limbs == 1:
+        return list(limbs)
+    keys = list()
+    for start in range(0, len(limbs), key_limbs):
+        key = 0
+        for limb in reversed(limbs[start:start + key_limbs]):
+            key = (key << 64) | limb
+        keys.append(key)
+    return keys
+
+def _pack_rank(rank):
+    """
+    Returns the sections for a rank: the grid points,
+    decisions, objectives, constraints, and tagalongs of its
+    valid individuals, in slot order.
+    """
+    if isinstance(rank, ArrayRank):
+        members = rank.slots[:rank.occupancy]
+        return [rank.grid_points[members].astype("<u4").tobytes()] + [
+            matrix[members].astype("<f8").tobytes() for matrix in (
+                rank.decisions, rank.objectives,
+                rank.constraints, rank.tagalongs)]
+    members = [rank.individuals[ii] for ii in rank.slots[:rank.occupancy]]
+    sections = list()
+    for field, code in (("grid_point", "I"), ("decisions", "d"),
+                        ("objectives", "d"), ("constraints", "d"),
+                        ("tagalongs", "d")):
+        values = list(chain.from_iterable(
+            getattr(ai, field) for ai in members))
+        sections.append(pack("<{}{}".format(len(values), code), *values))
+    return sections
+
+def _unpack_rank(rank, occupancy, grid, sections):
+    """
+    rank (Rank or ArrayRank): an empty rank to fill
+    occupancy (int): number of individuals saved in the rank
+
+    Returns the rank with the saved individuals in its first
+    occupancy slots.  Their order in slots is the same as when
+    they were saved, which is all that sampling depends on.
+    """
+    data = [sections.next() for _ in range(5)]
+    if isinstance(rank, ArrayRank):
+        rank.valid[:occupancy] = True
+        for matrix, section, dtype in zip(
+                (rank.grid_points, rank.decisions, rank.objectives,
+                 rank.constraints, rank.tagalongs),
+                data, ("<u4", "<f8", "<f8", "<f8", "<f8")):
+            matrix[:occupancy] = numpy.frombuffer(
+                section, dtype=dtype).reshape(occupancy, matrix.shape[1])
+        return rank._replace(occupancy=occupancy)
+    columns = list()
+    for section, code in zip(data, "Idddd"):
+        count = len(section) // calcsize("<" + code)
+        values = unpack("<{}{}".format(count, code), section)
+        width = len(values) // occupancy if occupancy else 0
+        if width == 0:
+            columns.append([tuple()] * occupancy)
+        else:
+            # zip over copies of one iterator chops it into rows
+            columns.append(list(zip(*[iter(values)] * width)))
+    grid_points, decisions, objectives, constraints, tagalongs = columns
+    rank.individuals[:occupancy] = list(map(
+        ArchiveIndividual,
+        repeat(True, occupancy),
+        map(grid.GridPoint._make, grid_points),
+        decisions,
+        objectives,
+        constraints,
+        tagalongs))
+    return rank._replace(occupancy=occupancy)
+
+def _rng_state(state):
+    """
+    Returns the state of the generators behind state.random and
+    state.randint as plain Python values, or an "unknown" kind
+    if they can't be saved.
+    """
+    if state.random is random and state.randint is randint:
+        return {"kind": "module", "state": _random_state(getstate())}
+    owner = getattr(state.random, "__self__", None)
+    if owner is not None and getattr(state.randint, "__self__", None) is owner:
+        if isinstance(owner, BufferedRNG):
+            return {"kind": "buffered", "state": owner.getstate()}
+        if isinstance(owner, Random):
+            try:
+                return {"kind": "random", "state": _random_state(owner.getstate())}
+            except NotImplementedError:
+                # SystemRandom has no state to save.
+                pass
+    return {"kind": "unknown"}
+
+def _random_state(random_state):
+    version, internal, gauss_next = random_state
+    return [version, list(internal), gauss_next]
+
+def _restore_rng(saved):
+    """
+    Returns random and randint functions restored from the
+    output of _rng_state, or Nones if it has no state.
+    """
+    kind = saved["kind"]
+    if kind == "module":
+        version, internal, gauss_next = saved["state"]
+        setstate((version, tuple(internal), gauss_next))
+        return random, randint
+    elif kind == "random":
+        version, internal, gauss_next = saved["state"]
+        generator = Random()
+        generator.setstate((version, tuple(internal), gauss_next))
+        return generator.random, generator.randint
+    elif kind == "buffered":
+        generator = BufferedRNG()
+        generator.setstate(saved["state"])
+        return generator.random, generator.randint
+    return None, None
@@ -48,10 +48,23 @@ EXHAUSTIVE = "exhaustive"   # fell back on grid sweep
 EXHAUSTED = "exhausted"     # totally exhausted
 COUNT = "count"
 
+# RANDOM DOE sampling
+UNIFORM = "uniform"         # uniform draws, rejecting duplicates
+PERMUTATION = "permutation" # walk a random permutation of the grid
+
 # Decision value retention policy
 RETAIN = "retain"
 DISCARD = "discard"
 
+# Archive storage
+LISTS = "lists"     # a list of ArchiveIndividuals per rank
+ARRAYS = "arrays"   # contiguous numpy arrays per rank
+MEMMAP = "memmap"   # numpy arrays in memory-mapped files per rank
+
+# Archive allocation
+EAGER = "eager"     # allocate every rank at full size up front
+LAZY = "lazy"       # grow ranks as they fill
+
 # Comparison Result
 LEFT_DOMINATES = "left dominates"
 RIGHT_DOMINATES = "right dominates"
@@ -0,0 +1,154 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Occupancy bitmap over grid point keys.
+
+There is one bit per grid point, set when the point is issued
+or returned and cleared if the archive forgets it, so it
+mirrors the issued and archive sets.  The bits are split into
+chunks of CHUNK_BITS, and, as in a roaring bitmap, a chunk is
+only stored as a bytearray while it is partly full.  Empty
+chunks are None and full chunks are FULL, so a mostly-empty or
+mostly-sampled grid costs little memory, and whole chunks can
+be skipped when looking for an unsampled point.
+"""
+
+from .Structures import Coverage
+
+CHUNK_BITS = 1 << 16
+FULL = "full"
+
+# Maps fully-set bytes to 1 and everything else to 0, so
+# that find() can look for a byte with a clear bit.
+_FULL_BYTES = bytearray([0] * 255 + [1])
+
+def new_coverage(total_points):
+    """
+    total_points (int): number of grid points
+
+    Returns an empty Coverage.
+    """
+    number_of_chunks = (total_points + CHUNK_BITS - 1) // CHUNK_BITS
+    return Coverage(
+        [None for _ in range(number_of_chunks)],
+        [0 for _ in range(number_of_chunks)],
+        total_points)
+
+def cover(coverage, key):
+    """
+    Set the bit for a grid point key.
+    """
+    chunk_index, bit = divmod(key, CHUNK_BITS)
+    chunk = coverage.chunks[chunk_index]
+    if chunk is FULL:
+        return
+    if chunk is None:
+        chunk = bytearray(CHUNK_BITS // 8)
+        coverage.chunks[chunk_index] = chunk
+    byte, mask = bit >> 3, 1 << (bit & 7)
+    if chunk[byte] & mask:
+        return
+    chunk[byte] |= mask
+    coverage.counts[chunk_index] += 1
+    if coverage.counts[chunk_index] == CHUNK_BITS:
+        coverage.chunks[chunk_index] = FULL
+
+def uncover(coverage, key):
+    """
+    Clear the bit for a grid point key.
+    """
+    chunk_index, bit = divmod(key, CHUNK_BITS)
+    chunk = coverage.chunks[chunk_index]
+    if chunk is None:
+        return
+    if chunk is FULL:
+        chunk = bytearray([255] * (CHUNK_BITS // 8))
+        coverage.chunks[chunk_index] = chunk
+    byte, mask = bit >> 3, 1 << (bit & 7)
+    if not chunk[byte] & mask:
+        return
+    chunk[byte] &= ~mask
+    coverage.counts[chunk_index] -= 1
+    if coverage.counts[chunk_index] == 0:
+        coverage.chunks[chunk_index] = None
+
+def next_uncovered(coverage, start):
+    """
+    Returns the smallest key no less than start whose bit is
+    clear, or None if there isn't one.
+    """
+    chunk_index, bit = divmod(start, CHUNK_BITS)
+    while chunk_index < len(coverage.chunks):
+        chunk = coverage.chunks[chunk_index]
+        base = chunk_index * CHUNK_BITS
+        if chunk is None:
+            key = base + bit
+            break
+        if chunk is not FULL:
+            # Check the rest of the first byte bit by bit, then
+            # find the next byte with a clear bit in one pass.
+            byte = bit >> 3
+            found = None
+            for offset in range(bit, min((byte + 1) << 3, CHUNK_BITS)):
+                if not chunk[offset >> 3] & (1 << (offset & 7)):
+                    found = offset
+                    break
+            if found is None:
+                byte = chunk.translate(_FULL_BYTES).find(b"\x00", byte + 1)
+                if byte >= 0:
+                    value = chunk[byte]
+                    found = byte << 3
+                    while value & 1:
+                        value >>= 1
+                        found += 1
+            if found is not None:
+                key = base + found
+                break
+        chunk_index += 1
+        bit = 0
+    else:
+        return None
+    if key >= coverage.total_points:
+        return None
+    return key
+
+def covered_count(coverage):
+    """
+    Returns the number of grid points whose bits are set.
+    """
+    return sum(coverage.counts)
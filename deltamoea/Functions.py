@@ -39,6 +39,10 @@ from collections import namedtuple
 
 from math import floor
 
+from tempfile import mkdtemp
+
+import os
+
 from random import random
 from random import randint
 
@@ -51,27 +55,53 @@ from .Constants import CORNERS
 from .Constants import RANDOM
 from .Constants import COUNT
 
+from .Constants import UNIFORM
+from .Constants import PERMUTATION
+
 from .Constants import RETAIN
 from .Constants import DISCARD
 
-from .Structures import Rank
+from .Constants import LISTS
+from .Constants import ARRAYS
+from .Constants import MEMMAP
+
+from .Constants import EAGER
+from .Constants import LAZY
+
+from .Structures import ArrayRank
 from .Structures import Individual
 from .Structures import ArchiveIndividual
 from .Structures import DOEState
 from .Structures import Axis
 from .Structures import Grid
-from .Structures import GridPoint
 from .Structures import Issue
 from .Structures import Issued
 from .Structures import MOEAState
+from .Structures import ArchiveStats
 
 from .Sorting import sort_into_archive
+from .Sorting import sort_front_into_archive
+from .Sorting import nondominated_fronts
+from .Sorting import empty_rank
+
+from .Arrays import empty_array_rank
+from .Arrays import memmap_array_rank
+from .Arrays import valid_array_indices
+from .Arrays import array_rank_individual
+from .Arrays import numpy
 
 from .Sampling import doe_next
 from .Sampling import evolve
+from .Sampling import new_permutation
+from .Sampling import encode_grid_point
 from .Sampling import NearExhaustionWarning
 from .Sampling import TotalExhaustionError
 
+from .Coverage import new_coverage
+from .Coverage import cover
+from .Coverage import covered_count
+from .Coverage import uncover
+
 def create_moea_state(problem, **kwargs):
     """
     problem (Problem): definition of problem structure.
@@ -114,9 +144,58 @@ def create_moea_state(problem, **kwargs):
                      generator and the algorithm may not
                      converge if it is not.  If not provided,
                      we fall back on Python's random.randint.
+        coverage (bool): if True, keep a bitmap of every
+                     grid point that has been sampled.  The
+                     EXHAUSTIVE DOE stage uses it to skip
+                     straight to unsampled points, and
+                     grid_coverage reports exactly how much of
+                     the grid has been sampled.  The bitmap
+                     costs at most one bit per grid point, so
+                     it's only allowed for grids of up to
+                     2 ** 36 points.  (default False)
+        distribution_index (float): nonnegative SBX distribution
+                     index.  Larger values keep offspring
+                     closer to their primary parents.
+                     (default 1.0)
+        storage (LISTS, ARRAYS, or MEMMAP): how to store the
+                     archive.
+                     LISTS, the default, keeps each rank as a list
+                     of ArchiveIndividual namedtuples.  ARRAYS
+                     keeps each rank as a set of contiguous numpy
+                     arrays (a valid mask and one matrix each for
+                     grid points, decisions, objectives, constraints,
+                     and tagalongs).  ARRAYS requires numpy, but
+                     it uses far less memory than LISTS and
+                     the archive is allocated almost instantly.
+                     MEMMAP is ARRAYS with every rank after the
+                     first resident_ranks kept in a memory-mapped
+                     file, one fixed-size record per slot, so the
+                     archive can be larger than memory.  With
+                     RETAIN and many decisions, that's the only
+                     way to have lots of large ranks.  MEMMAP
+                     requires EAGER allocation.
+        directory (str): for MEMMAP, the directory to keep the
+                     rank files in.  It's created if it doesn't
+                     exist, and any rank files already in it are
+                     overwritten.  The files are left behind for
+                     the caller to remove.  (default: a new
+                     temporary directory)
+        resident_ranks (int): for MEMMAP, the number of ranks
+                     to keep in memory.  Sampling and sorting
+                     touch the first ranks far more than the
+                     rest.  (default 2)
+        allocation (EAGER or LAZY): when to allocate the archive.
+                     EAGER, the default, allocates every rank at
+                     full size up front.  LAZY starts every rank
+                     empty and grows it geometrically, up to
+                     ranksize, as individuals are sorted into it.
+                     With LAZY, startup time and memory depend on
+                     how full the archive is rather than on ranks
+                     and ranksize.
 
     This function creates MOEA state, including
-    pre-allocation of a large archive for individuals.
+    pre-allocation of a large archive for individuals
+    unless allocation is LAZY.
 
     If the individuals are very large, it may make sense
     to reduce ranks or ranksize to avoid an unnecessary
@@ -132,36 +211,107 @@ def create_moea_state(problem, **kwargs):
     ranksize = kwargs.get('ranksize', 10000)
     _random = kwargs.get('random', random)
     _randint = kwargs.get('randint', randint)
+    distribution_index = kwargs.get('distribution_index', 1.0)
+    track_coverage = kwargs.get('coverage', False)
+    storage = kwargs.get('storage', LISTS)
+    allocation = kwargs.get('allocation', EAGER)
     grid = _create_grid(problem.decisions)
-    archive = [_empty_rank(problem, float_values, ranksize)
-               for _ in range(ranks)]
-    rank_A = _empty_rank(problem, float_values, ranksize)
-    rank_B = _empty_rank(problem, float_values, ranksize)
+    if track_coverage:
+        total_points = grid.strides[-1] * len(grid.axes[-1])
+        if total_points > 2 ** 36:
+            raise Exception(
+                "A grid of {} points is too large for a coverage "
+                "bitmap.".format(total_points))
+        coverage = new_coverage(total_points)
+    else:
+        coverage = None
+    if allocation == EAGER:
+        initial_size = ranksize
+    elif allocation == LAZY:
+        # Sorting grows the ranks as they fill.
+        initial_size = 0
+    else:
+        raise Exception("Unknown archive allocation {}".format(allocation))
+    if storage == MEMMAP and allocation == LAZY:
+        raise Exception(
+            "MEMMAP storage can't be LAZY, and doesn't need to be: "
+            "its files are sparse.")
+    new_rank = _rank_factory(
+        problem, float_values, grid, storage,
+        directory=kwargs.get('directory', None),
+        resident_ranks=kwargs.get('resident_ranks', 2))
+    archive = [new_rank(initial_size, ii) for ii in range(ranks)]
+    rank_A = new_rank(initial_size)
+    rank_B = new_rank(initial_size)
     issued = Issued(
-        [Issue(grid.GridPoint(*(-1 for _ in problem.decisions)), False)
-         for _ in range(ranksize)],
+        [Issue(-1, False) for _ in range(ranksize)],
         0,
-        set())
+        set(),
+        dict())
     # This is a placeholder.  We call doe() below to
     # initialize the doe state.
-    doestate = DOEState(RANDOM, COUNT, 0, 0)
+    doestate = DOEState(RANDOM, COUNT, 0, 0, None)
 
     state = MOEAState(
         problem,
         float_values,
         grid,
         archive,
+        ranksize,
         set(), # archive_set for Python acceleration
+        ArchiveStats(0, 0, tuple(0 for _ in range(ranks))),
         rank_A,
         rank_B,
         issued,
         _random,
         _randint,
-        doestate
+        distribution_index,
+        doestate,
+        dict(), # selection_tables for Python acceleration
+        coverage
     )
     state = doe(state)
     return state
 
+def _rank_factory(problem, float_values, grid, storage, **kwargs):
+    """
+    problem (Problem)
+    float_values (RETAIN or DISCARD)
+    grid (Grid)
+    storage (LISTS, ARRAYS, or MEMMAP)
+
+    keywords:
+        directory, resident_ranks: as for create_moea_state
+
+    Returns a function new_rank(capacity, rank_number=None)
+    that makes an empty rank.  rank_number is the archive rank
+    it's for, or None for the scratch ranks used by sorting,
+    which are always kept in memory.
+    """
+    if storage == ARRAYS:
+        def new_rank(capacity, rank_number=None):
+            return empty_array_rank(problem, float_values, grid, capacity)
+    elif storage == LISTS:
+        def new_rank(capacity, rank_number=None):
+            return empty_rank(problem, float_values, capacity)
+    elif storage == MEMMAP:
+        directory = kwargs.get('directory', None)
+        if directory is None:
+            directory = mkdtemp(prefix="deltamoea-")
+        elif not os.path.isdir(directory):
+            os.makedirs(directory)
+        resident_ranks = kwargs.get('resident_ranks', 2)
+        def new_rank(capacity, rank_number=None):
+            if rank_number is None or rank_number < resident_ranks:
+                return empty_array_rank(
+                    problem, float_values, grid, capacity)
+            return memmap_array_rank(
+                problem, float_values, grid, capacity,
+                os.path.join(directory, "rank{}.dat".format(rank_number)))
+    else:
+        raise Exception("Unknown archive storage {}".format(storage))
+    return new_rank
+
 def doe(state, **kwargs):
     """
     Return an MOEAState such that the next generated
@@ -174,7 +324,8 @@ def doe(state, **kwargs):
         corners         (2 ^ ndv samples)
         center point    (1 sample)
         OFAT            (2 * ndv samples)
-        random uniform  (unlimited samples)
+        random          (unlimited samples, unless sampling
+                         is PERMUTATION)
 
     If a different DOE procedure works better for your problem,
     you may substitute one of your choosing by running the
@@ -199,9 +350,26 @@ def doe(state, **kwargs):
             Default is ndv.
         stage (CORNERS, CENTERPOINT, OFAT, RANDOM): at which
             stage to start sampling.
+        sampling (UNIFORM or PERMUTATION): how to draw RANDOM
+            samples.  UNIFORM, the default, draws grid points
+            uniformly and throws away duplicates, falling
+            back on an exhaustive sweep of the grid when
+            duplicates get too common.  PERMUTATION walks
+            through a seeded random permutation of the whole
+            grid instead, so it never draws the same point
+            twice and it doesn't slow down as the grid fills
+            up.  It's worthwhile for small grids that might
+            be sampled almost completely.
     """
     terminate = kwargs.get("terminate", COUNT)
     stage = kwargs.get("stage", RANDOM)
+    sampling = kwargs.get("sampling", UNIFORM)
+    if sampling == UNIFORM:
+        permutation = None
+    elif sampling == PERMUTATION:
+        permutation = new_permutation(state.grid, state.randint)
+    else:
+        raise Exception("Unknown DOE sampling {}".format(sampling))
     if terminate == COUNT:
         default_count = len(state.problem.decisions)
         count = kwargs.get("count", default_count)
@@ -211,7 +379,9 @@ def doe(state, **kwargs):
     new_doestate = old_doestate._replace(
         terminate=terminate,
         stage=stage,
-        remaining=count)
+        counter=0,
+        remaining=count,
+        permutation=permutation)
     new_state = state._replace(doestate=new_doestate)
     return new_state
 
@@ -220,32 +390,136 @@ def return_evaluated_individual(state, individual):
     Return an MOEAState that accounts for the provided
     Individual.
     """
+    grid_point = decisions_to_grid_point(state.grid, individual.decisions)
+    state = _accept_grid_point(state, grid_point)
+    archive_individual = _archive_individual(state, individual, grid_point)
+
+    # sort the ArchiveIndividual into the archive
+    state = sort_into_archive(state, archive_individual)
+
+    # return the state
+    return state
+
+def return_evaluated_individuals(state, individuals):
+    """
+    state (MOEAState)
+    individuals (sequence of Individual)
+
+    Return an MOEAState that accounts for all of the provided
+    Individuals.  The archive ends up holding the same
+    individuals in the same ranks as if each Individual had
+    been passed to return_evaluated_individual in turn.
+    It's much cheaper for large batches, though: the batch is
+    Pareto sorted among itself first, and then each of its
+    fronts is merged into the archive with a single pass
+    over the ranks.
+
+    That equivalence only holds if no rank overflows and
+    nothing is dumped into the last rank, and if no grid
+    point is evaluated twice.  If a batch could break it,
+    the individuals are returned one at a time instead.
+    """
+    individuals = list(individuals)
+    grid_points = [decisions_to_grid_point(state.grid, i.decisions)
+                   for i in individuals]
+    keys = [encode_grid_point(state.grid, gp) for gp in grid_points]
+    archive_set = state.archive_set
+    revisited = (len(set(keys)) < len(keys)
+                 or any(key in archive_set for key in keys))
+    fronts = None
+    if len(individuals) > 1 and not revisited:
+        archive_individuals = list()
+        for individual, grid_point in zip(individuals, grid_points):
+            archive_individuals.append(
+                _archive_individual(state, individual, grid_point))
+        fronts = nondominated_fronts(archive_individuals)
+        if not _batch_fits(state.archive, state.ranksize,
+                           len(individuals), len(fronts)):
+            fronts = None
+    if fronts is None:
+        for individual in individuals:
+            state = return_evaluated_individual(state, individual)
+        return state
+
+    for grid_point in grid_points:
+        state = _accept_grid_point(state, grid_point)
+    for front in fronts:
+        state = sort_front_into_archive(
+            state, [archive_individuals[ii] for ii in front])
+    return state
+
+def _batch_fits(archive, ranksize, batch_size, number_of_fronts):
+    """
+    archive (list of Ranks)
+    ranksize (int): number of individuals a rank may hold
+    batch_size (int): number of individuals in the batch
+    number_of_fronts (int): number of fronts in the batch
+
+    Returns True if merging the batch front by front can't
+    overflow a rank or reach the last rank.
+
+    Adding the batch pushes an individual down by at most one
+    rank per front, so rank k ends up holding at most the
+    batch plus what is now in ranks k - number_of_fronts
+    through k.
+    """
+    if archive[-1].occupancy > 0:
+        return False
+    depth = 0
+    for ii, rank in enumerate(archive):
+        if rank.occupancy > 0:
+            depth = ii + 1
+    if depth + number_of_fronts > len(archive) - 1:
+        return False
+    window = 0
+    for ii in range(depth + number_of_fronts):
+        window += archive[ii].occupancy
+        if ii - number_of_fronts - 1 >= 0:
+            window -= archive[ii - number_of_fronts - 1].occupancy
+        if window + batch_size > ranksize:
+            return False
+    return True
+
+def _accept_grid_point(state, grid_point):
+    """
+    Record that an evaluated grid point is in the archive and
+    no longer outstanding.
+
+    Returns the updated MOEAState.
+    """
+    key = encode_grid_point(state.grid, grid_point)
+    archive_set = state.archive_set
+    archive_set.add(key)
+    if state.coverage is not None:
+        cover(state.coverage, key)
+    state = state._replace(archive_set=archive_set)
+    issue_index = state.issued.issue_index
+    index = issue_index.pop(key, None)
+    if index is not None:
+        issues = state.issued.issues
+        issues[index] = issues[index]._replace(outstanding=False)
+        issued_set = state.issued.issued_set
+        issued_set.remove(key)
+        # These _replace calls are not strictly necessary
+        # because we're mutating internal structures, but
+        # I have a "don't change without calling _replace" rule
+        # for myself.
+        issued = state.issued._replace(
+            issues=issues,
+            issued_set=issued_set,
+            issue_index=issue_index)
+        state = state._replace(issued=issued)
+    return state
+
+def _archive_individual(state, individual, grid_point):
+    """
+    Returns the ArchiveIndividual for an Individual.
+    """
     # produce an ArchiveIndividual from the Individual
     if state.float_values == RETAIN:
         decisions = individual.decisions
     else:
         decisions = tuple()
-    grid_point = decisions_to_grid_point(state.grid, individual.decisions)
-    archive_set = state.archive_set
-    archive_set.add(grid_point)
-    state = state._replace(archive_set=archive_set)
-    issues = state.issued.issues
-    for ii in range(len(issues)):
-        issue = issues[ii]
-        if issue.outstanding and issue.grid_point == grid_point:
-            issues[ii] = issue._replace(outstanding=False)
-            issued_set = state.issued.issued_set
-            issued_set.remove(grid_point)
-            # These _replace calls are not strictly necessary
-            # because we're mutating internal structures, but
-            # I have a "don't change without calling _replace" rule
-            # for myself.
-            issued = state.issued._replace(
-                issues=issues,
-                issued_set=issued_set)
-            state = state._replace(issued=issued)
-            break
-
     # ArchiveIndividuals always sort with < and we reverse the transformation
     # when returning Individuals.
     problem = state.problem
@@ -262,7 +536,7 @@ def return_evaluated_individual(state, individual):
             constraints.append(value)
         else:
             constraints.append(-value)
-    archive_individual = ArchiveIndividual(
+    return ArchiveIndividual(
         True,
         grid_point,
         decisions,
@@ -270,12 +544,6 @@ def return_evaluated_individual(state, individual):
         tuple(constraints),
         individual.tagalongs)
 
-    # sort the ArchiveIndividual into the archive
-    state = sort_into_archive(state, archive_individual)
-
-    # return the state
-    return state
-
 def decisions_to_grid_point(grid, decisions):
     """
     grid (Grid): map between the axes and the 
@@ -300,6 +568,29 @@ def decisions_to_grid_point(grid, decisions):
                 indices.append(under + 1)
     return grid.GridPoint(*indices)
 
+def archive_stats(state):
+    """
+    state (MOEAState)
+
+    Returns an ArchiveStats with the total number of
+    individuals in the archive, the number of ranks before
+    the first empty one, and the size of every rank.  These
+    are maintained as individuals are sorted into the archive,
+    so this is cheap enough to call as often as you like.
+    """
+    return state.archive_stats
+
+def grid_coverage(state):
+    """
+    state (MOEAState): created with coverage=True
+
+    Returns the number of grid points that have been sampled
+    and the total number of grid points.
+    """
+    if state.coverage is None:
+        raise Exception("This state doesn't track grid coverage.")
+    return covered_count(state.coverage), state.coverage.total_points
+
 def get_iterator(state, rank_number):
     """
     Generator that iterates over the solutions in a rank.
@@ -317,7 +608,14 @@ def get_iterator(state, rank_number):
             c_coefficients.append(-1)
         else:
             c_coefficients.append(1)
-    for a_individual in state.archive[rank_number].individuals:
+    rank = state.archive[rank_number]
+    if isinstance(rank, ArrayRank):
+        a_individuals = (array_rank_individual(rank, ii)
+                         for ii in valid_array_indices(rank))
+    else:
+        a_individuals = (rank.individuals[ii]
+                         for ii in rank.slots[:rank.occupancy])
+    for a_individual in a_individuals:
         if a_individual.valid:
             sample = state.grid.Sample(
                 *(a[i] for a, i in zip(axes, a_individual.grid_point)))
@@ -338,6 +636,90 @@ def get_sample(state):
 
     Returns a new MOEAState and a sample in decision space.
     """
+    state, grid_point = _next_grid_point(state)
+    state = _issue(state, [encode_grid_point(state.grid, grid_point)])
+
+    grid = state.grid
+    sample = grid.Sample(*(a[i] for a, i in zip(grid.axes, grid_point)))
+    # Return sample
+    return state, sample
+
+def get_samples(state, count, **kwargs):
+    """
+    state (MOEAState): current algorithm state
+    count (int): number of samples to produce
+
+    keywords:
+        matrix (bool): if True, return the samples as a numpy
+                     matrix with one row per sample and one
+                     column per decision, ready to hand to a
+                     vectorized evaluator.  Requires numpy.
+                     Default is False, which returns a list of
+                     samples like the ones get_sample returns.
+
+    Returns a new MOEAState and count distinct samples in
+    decision space.  This is the same as calling get_sample
+    count times, except that all of the samples are issued
+    at once.
+
+    If NearExhaustionWarning or TotalExhaustionError is raised
+    partway through the batch, the samples produced before it
+    are issued on the state attached to the exception, and
+    they are attached to the exception as its samples member
+    so that they can be evaluated like any others.  The DOE
+    has moved past them, so they would not come round again.
+    """
+    as_matrix = kwargs.get("matrix", False)
+    if as_matrix and numpy is None:
+        raise Exception("Sample matrices require numpy.")
+    grid = state.grid
+    grid_points = list()
+    keys = list()
+    # Outstanding keys have to be in the issued set as we go so
+    # that the batch doesn't duplicate itself.
+    issued_set = state.issued.issued_set
+    try:
+        for _ in range(count):
+            state, grid_point = _next_grid_point(state)
+            key = encode_grid_point(grid, grid_point)
+            issued_set.add(key)
+            grid_points.append(grid_point)
+            keys.append(key)
+    except (NearExhaustionWarning, TotalExhaustionError) as ee:
+        ee.state = _issue(ee.state, keys)
+        ee.samples = _samples(grid, grid_points, as_matrix)
+        raise
+    state = _issue(state, keys)
+    return state, _samples(grid, grid_points, as_matrix)
+
+def _samples(grid, grid_points, as_matrix):
+    """
+    grid (Grid)
+    grid_points (list of GridPoint)
+    as_matrix (bool): whether to return a numpy matrix
+
+    Returns the samples at the grid points, as a list or as a
+    matrix with one row per sample.
+    """
+    if as_matrix:
+        indices = numpy.array(grid_points, dtype=int).reshape(
+            len(grid_points), len(grid.axes))
+        samples = numpy.empty(indices.shape)
+        for ii, axis in enumerate(grid.axes):
+            samples[:, ii] = numpy.array(axis)[indices[:, ii]]
+        return samples
+    return [
+        grid.Sample(*(a[i] for a, i in zip(grid.axes, grid_point)))
+        for grid_point in grid_points]
+
+def _next_grid_point(state):
+    """
+    state (MOEAState)
+
+    Returns a new MOEAState and the next grid point to sample,
+    from the DOE or from evolution.  The grid point is not
+    issued yet.
+    """
     # Should we do a DOE sample?
     if _should_do_doe(state):
         state, grid_point = doe_next(state)
@@ -350,24 +732,61 @@ def get_sample(state):
                     remaining=state.doestate.remaining - 1))
     else:
         state, grid_point = evolve(state)
+    return state, grid_point
 
-    # Add grid_point to issued list
+def _issue(state, keys):
+    """
+    state (MOEAState)
+    keys (sequence of int): keys of the grid points to issue
+
+    Add grid points to the issued list.
+
+    Returns the updated MOEAState.
+    """
     issues = state.issued.issues
     index = state.issued.index
-    issues[index] = Issue(grid_point, True)
+    issue_index = state.issued.issue_index
     issued_set = state.issued.issued_set
-    issued_set.add(grid_point)
-    state = state._replace(
+    for key in keys:
+        # An outstanding issue that is about to be overwritten
+        # can't be found any more, just as if we had to scan for it.
+        overwritten = issues[index]
+        # After total exhaustion the same key can be outstanding
+        # more than once, and the index only knows the latest.
+        if (overwritten.outstanding
+                and issue_index.get(overwritten.key) == index):
+            del issue_index[overwritten.key]
+        issues[index] = Issue(key, True)
+        issue_index[key] = index
+        issued_set.add(key)
+        if state.coverage is not None:
+            cover(state.coverage, key)
+        index = (index + 1) % len(issues)
+    return state._replace(
         issued=state.issued._replace(
             issues=issues,
             issued_set=issued_set,
-            index=(index + 1) % len(issues)
+            issue_index=issue_index,
+            index=index
     ))
 
-    grid = state.grid
-    sample = grid.Sample(*(a[i] for a, i in zip(grid.axes, grid_point)))
-    # Return sample
-    return state, sample
+def _withdraw(state, key):
+    """
+    state (MOEAState or Optimizer)
+    key (int): key of an outstanding grid point
+
+    Takes the grid point back out of the outstanding samples,
+    as if it had never been issued, so that it can be sampled
+    again.  The issued structures are modified in place.
+    """
+    issued = state.issued
+    index = issued.issue_index.pop(key, None)
+    if index is None:
+        return
+    issued.issues[index] = Issue(key, False)
+    issued.issued_set.discard(key)
+    if state.coverage is not None and key not in state.archive_set:
+        uncover(state.coverage, key)
 
 def _should_do_doe(state):
     """
@@ -442,46 +861,18 @@ def _create_grid(decisions):
         axis = Axis(values)
         axes.append(axis)
     _Deltas = namedtuple("Deltas", (d.name for d in decisions))
+    # Place values for encoding grid points as mixed-radix
+    # numbers, axis 0 least significant.
+    strides = list()
+    stride = 1
+    for axis in axes:
+        strides.append(stride)
+        stride *= len(axis)
     grid = Grid(
         _Axes(*axes),
         _Deltas(*(d.delta for d in decisions)),
         namedtuple("GridPoint", (d.name for d in decisions)),
-        namedtuple("Sample", (d.name for d in decisions))
+        namedtuple("Sample", (d.name for d in decisions)),
+        tuple(strides)
     )
     return grid
-
-def _empty_rank(problem, float_values, ranksize):
-    # construct bogus individuals to fill the rank
-    bogus_grid_point = tuple((999 for _ in problem.decisions))
-    if float_values == RETAIN:
-        bogus_decisions = tuple((0.0 for _ in problem.decisions))
-    else:
-        bogus_decisions = tuple()
-    bogus_objectives = list()
-    # in C99, math.h has macros for infinity and nan
-    inf = float("inf")
-    ninf = -inf
-    # Bogus individuals should never dominate true individuals.
-    for objective in problem.objectives:
-        if objective.sense == MAXIMIZE:
-            bogus_objectives.append(ninf)
-        else:
-            bogus_objectives.append(inf)
-    # Nor should they appear even remotely feasible.
-    bogus_constraints = list()
-    for constraint in problem.constraints:
-        if constraint.sense == MAXIMIZE:
-            bogus_constraints.append(ninf)
-        else:
-            bogus_constraints.append(inf)
-    bogus_tagalongs = list((0.0 for _ in problem.tagalongs))
-    bogus_archive_individual = ArchiveIndividual(
-        False, # and bogus individuals are invalid
-        bogus_grid_point,
-        bogus_decisions,
-        bogus_objectives,
-        bogus_constraints,
-        bogus_tagalongs)
-    return Rank([bogus_archive_individual for _ in range(ranksize)], 0)
-
-
@@ -0,0 +1,188 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+A buffered random number generator.
+
+BufferedRNG draws raw 64-bit words from a seeded numpy bit
+generator a block at a time, and serves random and randint
+calls out of the block.  Drawing words in blocks doesn't
+change them, so a given seed gives the same stream no matter
+what the block size is.  Its random and randint methods can
+be passed straight to create_moea_state:
+
+    rng = BufferedRNG(seed=42)
+    state = create_moea_state(
+        problem, random=rng.random, randint=rng.randint)
+"""
+
+from .Arrays import numpy
+
+# 2 ** -53: turns the top 53 bits of a word into a float on [0,1)
+_FLOAT_SCALE = 1.0 / 9007199254740992
+
+class BufferedRNG(object):
+    def __init__(self, seed=None, block_size=4096):
+        """
+        seed (int, None, or numpy.random.SeedSequence): seed for
+            the stream.  None seeds from the operating system.
+        block_size (int): number of 64-bit words to draw at a time
+        """
+        if numpy is None:
+            raise Exception("BufferedRNG requires numpy.")
+        if isinstance(seed, numpy.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = numpy.random.SeedSequence(seed)
+        self.bit_generator = numpy.random.PCG64(self.seed_sequence)
+        self.block_size = block_size
+        self._words = list()
+        self._position = 0
+
+    def _word(self):
+        """
+        Returns the next 64-bit word as a Python int.
+        """
+        if self._position >= len(self._words):
+            # tolist converts the whole block to Python ints at
+            # C speed, which is much cheaper than converting
+            # numpy scalars one at a time.
+            self._words = self.bit_generator.random_raw(
+                self.block_size).tolist()
+            self._position = 0
+        word = self._words[self._position]
+        self._position += 1
+        return word
+
+    def random(self):
+        """
+        Returns a float on the interval [0,1).
+        """
+        # _word, inlined: this is the hot path
+        position = self._position
+        if position >= len(self._words):
+            self._words = self.bit_generator.random_raw(
+                self.block_size).tolist()
+            position = 0
+        self._position = position + 1
+        return (self._words[position] >> 11) * _FLOAT_SCALE
+
+    def randint(self, a, b):
+        """
+        Returns an int on the interval [a,b], like
+        random.randint.  Any range is allowed, including ones
+        wider than 64 bits.
+        """
+        span = b - a + 1
+        if span <= 0:
+            raise ValueError("empty range for randint({}, {})".format(a, b))
+        bits = (span - 1).bit_length()
+        if bits == 0:
+            return a
+        # Rejection sampling on just enough bits, so every value
+        # in the range is equally likely.  Less than two tries
+        # on average.
+        while True:
+            value = 0
+            remaining = bits
+            while remaining > 64:
+                value = (value << 64) | self._word()
+                remaining -= 64
+            value = (value << remaining) | (self._word() >> (64 - remaining))
+            if value < span:
+                return a + value
+
+    def randoms(self, count):
+        """
+        Returns a numpy array of count floats on [0,1), the same
+        ones that count calls to random would return.  This is
+        the batch interface for numpy code that needs many
+        draws at once.
+        """
+        words = numpy.empty(count, dtype=numpy.uint64)
+        buffered = min(count, len(self._words) - self._position)
+        words[:buffered] = self._words[
+            self._position:self._position + buffered]
+        self._position += buffered
+        if buffered < count:
+            words[buffered:] = self.bit_generator.random_raw(
+                count - buffered)
+        return (words >> numpy.uint64(11)) * _FLOAT_SCALE
+
+    def getstate(self):
+        """
+        Returns the generator's state as a dict of plain
+        Python values, which can be saved as JSON.
+        """
+        seed_sequence = self.seed_sequence
+        return {
+            "entropy": seed_sequence.entropy,
+            "spawn_key": list(seed_sequence.spawn_key),
+            "pool_size": seed_sequence.pool_size,
+            "n_children_spawned": seed_sequence.n_children_spawned,
+            "bit_generator": self.bit_generator.state,
+            "block_size": self.block_size,
+            "words": self._words[self._position:],
+        }
+
+    def setstate(self, state):
+        """
+        state (dict): a state returned by getstate
+
+        Restores the generator to that state, including the
+        words left in its block and its spawn count.
+        """
+        self.seed_sequence = numpy.random.SeedSequence(
+            state["entropy"],
+            spawn_key=tuple(state["spawn_key"]),
+            pool_size=state["pool_size"],
+            n_children_spawned=state["n_children_spawned"])
+        self.bit_generator = numpy.random.PCG64()
+        self.bit_generator.state = state["bit_generator"]
+        self.block_size = state["block_size"]
+        self._words = list(state["words"])
+        self._position = 0
+
+    def spawn(self, count):
+        """
+        Returns a list of count new BufferedRNGs whose streams
+        are independent of this one and of each other, for
+        parallel runs.  Spawning is itself reproducible: the
+        same seed spawns the same children.
+        """
+        return [BufferedRNG(child, self.block_size)
+                for child in self.seed_sequence.spawn(count)]
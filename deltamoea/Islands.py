@@ -0,0 +1,269 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+The island model: independent MOEA states in separate
+processes, each with its own random number stream, that
+periodically send their rank 0 individuals to their
+neighbours.  No state is shared, so nothing waits on a
+global archive until the islands are merged at the end.
+"""
+
+from multiprocessing import Process
+from multiprocessing import Queue
+
+from random import Random
+
+from traceback import format_exc
+
+from .Structures import Individual
+
+from .Functions import create_moea_state
+from .Functions import get_sample
+from .Functions import return_evaluated_individual
+from .Functions import return_evaluated_individuals
+from .Functions import get_iterator
+from .Functions import decisions_to_grid_point
+
+from .Sampling import encode_grid_point
+from .Sampling import NearExhaustionWarning
+from .Sampling import TotalExhaustionError
+
+from .Arrays import numpy
+
+from .Generators import BufferedRNG
+
+def optimize_islands(problem, factory, evaluations, islands, **kwargs):
+    """
+    problem (Problem): definition of problem structure.
+    factory (callable): called once in each island process
+                     with factory_args, and returns an
+                     evaluation function that takes a tuple of
+                     decision values and returns an evaluated
+                     Individual.  It must be defined at module
+                     level so that it can be pickled.
+    evaluations (int): number of samples each island evaluates
+    islands (int): number of islands
+
+    keywords:
+        factory_args (tuple): arguments for factory (default ())
+        migration_interval (int): number of evaluations each
+                     island performs between migrations
+                     (default 1000)
+        seed (int): seed for the islands' random number
+                     streams.  With numpy, each island gets a
+                     stream spawned from BufferedRNG(seed);
+                     otherwise each gets a random.Random seeded
+                     from random.Random(seed).  (default None,
+                     which seeds from the operating system)
+        state_kwargs (dict): keywords for create_moea_state,
+                     used for every island and for the merged
+                     archive.  Don't include random or randint.
+                     (default {})
+
+    The islands are arranged in a ring.  After every
+    migration_interval evaluations, each island sends the
+    individuals in its rank 0 to the islands on either side,
+    and inserts the ones it receives with
+    return_evaluated_individual, skipping grid points it has
+    already archived.  Migration is synchronous, so a run is
+    reproducible for a given seed.
+
+    Returns an MOEAState whose archive is the merge of every
+    island's archive (see merge_archives).
+    """
+    factory_args = kwargs.get("factory_args", tuple())
+    migration_interval = kwargs.get("migration_interval", 1000)
+    seed = kwargs.get("seed", None)
+    state_kwargs = kwargs.get("state_kwargs", dict())
+    if migration_interval < 1:
+        raise Exception(
+            "Migration interval {} is less than 1.".format(migration_interval))
+
+    generators = _island_generators(seed, islands)
+    inboxes = [Queue() for _ in range(islands)]
+    results = Queue()
+    processes = list()
+    for ii in range(islands):
+        neighbours = sorted(set(
+            ((ii - 1) % islands, (ii + 1) % islands)) - set((ii,)))
+        process = Process(target=_run_island, args=(
+            ii, problem, factory, factory_args, generators[ii],
+            state_kwargs, evaluations, migration_interval,
+            inboxes, neighbours, results))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+
+    archives = [None for _ in range(islands)]
+    try:
+        for _ in range(islands):
+            ii, archive, error = results.get()
+            if error is not None:
+                raise Exception("Island {} failed:\n{}".format(ii, error))
+            archives[ii] = archive
+    finally:
+        if any(archive is None for archive in archives):
+            # An island failed, so its neighbours may be waiting
+            # for migrants that will never come.
+            for process in processes:
+                process.terminate()
+        for process in processes:
+            process.join()
+
+    state = create_moea_state(problem, **state_kwargs)
+    return merge_archives(state, archives)
+
+def merge_archives(state, archives):
+    """
+    state (MOEAState): the state to merge into
+    archives (sequence of sequences of Individuals): the
+                     evaluated individuals to merge, for
+                     instance the contents of several islands'
+                     archives
+
+    Returns an MOEAState with every distinct grid point in the
+    archives sorted into its archive.  When the same grid point
+    appears more than once, or is already in state's archive,
+    only its first appearance counts.
+    """
+    grid = state.grid
+    keys = set(state.archive_set)
+    individuals = list()
+    for archive in archives:
+        for individual in archive:
+            key = encode_grid_point(
+                grid, decisions_to_grid_point(grid, individual.decisions))
+            if key not in keys:
+                keys.add(key)
+                individuals.append(individual)
+    return return_evaluated_individuals(state, individuals)
+
+def _island_generators(seed, islands):
+    """
+    Returns an independent random number generator for each
+    island.  Each one has random and randint methods.
+    """
+    if numpy is not None:
+        return BufferedRNG(seed).spawn(islands)
+    master = Random(seed)
+    return [Random(master.getrandbits(64)) for _ in range(islands)]
+
+def _run_island(index, problem, factory, factory_args, generator,
+                state_kwargs, evaluations, migration_interval,
+                inboxes, neighbours, results):
+    """
+    The body of an island process.  Puts (index, archive, error)
+    on the results queue when it's done, where archive is a list
+    of every Individual in the island's archive, or None if
+    there was an error.
+    """
+    try:
+        evaluate = factory(*factory_args)
+        state = create_moea_state(
+            problem,
+            random=generator.random,
+            randint=generator.randint,
+            **state_kwargs)
+        exhausted = False
+        # Migrants that showed up early, by epoch.
+        early = dict()
+        done = 0
+        epoch = 0
+        while done < evaluations:
+            count = min(migration_interval, evaluations - done)
+            for _ in range(count):
+                if exhausted:
+                    break
+                try:
+                    state, sample = get_sample(state)
+                except NearExhaustionWarning as ew:
+                    state = ew.state
+                    continue
+                except TotalExhaustionError as te:
+                    state = te.state
+                    exhausted = True
+                    break
+                state = return_evaluated_individual(
+                    state, evaluate(tuple(sample)))
+            done += count
+            if done >= evaluations or not neighbours:
+                continue
+
+            # Exhausted islands still migrate, so that their
+            # neighbours don't wait for them forever.
+            migrants = _archive_individuals(state, (0,))
+            for neighbour in neighbours:
+                inboxes[neighbour].put((epoch, index, migrants))
+            arrived = early.pop(epoch, dict())
+            while len(arrived) < len(neighbours):
+                message_epoch, sender, individuals = inboxes[index].get()
+                if message_epoch == epoch:
+                    arrived[sender] = individuals
+                else:
+                    early.setdefault(message_epoch, dict())[sender] = individuals
+            # Insert in a fixed order so that runs are reproducible.
+            for sender in sorted(arrived):
+                for individual in arrived[sender]:
+                    key = encode_grid_point(
+                        state.grid,
+                        decisions_to_grid_point(
+                            state.grid, individual.decisions))
+                    if key not in state.archive_set:
+                        state = return_evaluated_individual(state, individual)
+            epoch += 1
+        results.put((
+            index,
+            _archive_individuals(state, range(len(state.archive))),
+            None))
+    except Exception:
+        results.put((index, None, format_exc()))
+
+def _archive_individuals(state, rank_numbers):
+    """
+    Returns the Individuals in the given ranks as plain tuples,
+    which can be pickled, unlike Samples.
+    """
+    individuals = list()
+    for rank_number in rank_numbers:
+        for individual in get_iterator(state, rank_number):
+            individuals.append(Individual(
+                tuple(individual.decisions),
+                tuple(individual.objectives),
+                tuple(individual.constraints),
+                tuple(individual.tagalongs)))
+    return individuals
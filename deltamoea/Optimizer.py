@@ -0,0 +1,155 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+A mutable alternative to the functional MOEAState API.
+
+Every call in the functional API returns a new MOEAState, which
+means a handful of namedtuple rebuilds per sample even though
+the lists and sets inside are mutated in place anyway.  An
+Optimizer holds the same data in mutable attributes and runs
+the same algorithm through its ask and tell methods, so the
+samples and the archive are identical to what get_sample and
+return_evaluated_individual would produce from the same state.
+"""
+
+from .Structures import MOEAState
+
+from .Functions import create_moea_state
+from .Functions import decisions_to_grid_point
+from .Functions import doe
+from .Functions import _next_grid_point
+from .Functions import _issue
+from .Functions import _accept_grid_point
+from .Functions import _archive_individual
+
+from .Sorting import sort_into_archive
+
+from .Sampling import encode_grid_point
+
+class Optimizer(object):
+    __slots__ = MOEAState._fields
+
+    def __init__(self, problem, **kwargs):
+        """
+        problem (Problem): definition of problem structure.
+
+        Takes the same keywords as create_moea_state.
+        """
+        self._load(create_moea_state(problem, **kwargs))
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        state (MOEAState)
+
+        Returns an Optimizer that takes over the data in the
+        MOEAState.  The lists and sets are shared, not copied,
+        so as with the functional API, the MOEAState shouldn't
+        be used after it's been passed in.
+        """
+        optimizer = cls.__new__(cls)
+        optimizer._load(state)
+        return optimizer
+
+    def _load(self, state):
+        for field, value in zip(MOEAState._fields, state):
+            setattr(self, field, value)
+
+    def to_state(self):
+        """
+        Returns an MOEAState holding the Optimizer's data,
+        for use with the functional API.  The data is shared,
+        not copied, so the Optimizer shouldn't be used after
+        calling this.
+        """
+        return MOEAState(*(getattr(self, field)
+                           for field in MOEAState._fields))
+
+    def _replace(self, **kwargs):
+        """
+        Updates attributes in place and returns the Optimizer.
+
+        This is what lets the functional internals (doe_next,
+        evolve, sort_into_archive, ...) run on an Optimizer as
+        if it were an MOEAState: their state._replace calls
+        become attribute assignments rather than rebuilds.
+        """
+        for field, value in kwargs.items():
+            setattr(self, field, value)
+        return self
+
+    def doe(self, **kwargs):
+        """
+        Restarts the design of experiments.  Takes the same
+        keywords as the doe function.
+        """
+        doe(self, **kwargs)
+
+    def ask(self):
+        """
+        Returns a sample in decision space, like get_sample.
+
+        NearExhaustionWarning and TotalExhaustionError are
+        raised as they are by get_sample; their state member is
+        the Optimizer itself, which stays usable.
+        """
+        _, sample = self._ask_key()
+        return sample
+
+    def _ask_key(self):
+        """
+        Returns the key of the next sample and the sample.
+        """
+        _, grid_point = _next_grid_point(self)
+        grid = self.grid
+        key = encode_grid_point(grid, grid_point)
+        _issue(self, (key,))
+        return key, grid.Sample(
+            *(a[i] for a, i in zip(grid.axes, grid_point)))
+
+    def tell(self, individual):
+        """
+        individual (Individual): an evaluated individual
+
+        Accounts for the Individual, like
+        return_evaluated_individual.
+        """
+        grid_point = decisions_to_grid_point(self.grid, individual.decisions)
+        _accept_grid_point(self, grid_point)
+        sort_into_archive(
+            self, _archive_individual(self, individual, grid_point))
@@ -0,0 +1,165 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Evaluation in a pool of worker processes, for CPU-bound
+problems.  The MOEA state stays in the parent process; the
+workers only evaluate samples.
+"""
+
+from collections import deque
+
+from multiprocessing import Pool
+from multiprocessing import cpu_count
+
+from time import time
+
+from .Structures import Throughput
+
+from .Functions import get_samples
+from .Functions import return_evaluated_individuals
+
+from .Sampling import NearExhaustionWarning
+from .Sampling import TotalExhaustionError
+
+# Each worker process builds its evaluation function once,
+# when it starts.
+_worker_evaluate = None
+
+def _initialize_worker(factory, factory_args):
+    global _worker_evaluate
+    _worker_evaluate = factory(*factory_args)
+
+def _evaluate_batch(decisions):
+    return [_worker_evaluate(dvs) for dvs in decisions]
+
+def optimize_in_pool(state, factory, evaluations, **kwargs):
+    """
+    state (MOEAState): current algorithm state
+    factory (callable): called once in each worker process with
+                     factory_args, and returns an evaluation
+                     function.  The evaluation function takes a
+                     tuple of decision values and returns an
+                     evaluated Individual.  The factory and its
+                     arguments are pickled, so the factory must
+                     be defined at module level.  Every worker
+                     must build the same problem, so a factory
+                     that draws random numbers (for a random
+                     rotation, say) should seed them itself.
+    evaluations (int): number of samples to evaluate
+
+    keywords:
+        factory_args (tuple): arguments for factory (default ())
+        processes (int): number of worker processes
+                     (default None, which means the number of CPUs)
+        batch_size (int): number of samples sent to a worker at
+                     a time.  Larger batches cost less in
+                     interprocess communication; smaller ones
+                     keep the archive more up to date.
+                     (default 8)
+        window (int): number of batches in flight at once
+                     (default 2 * processes, so that a worker
+                     never has to wait for the parent)
+
+    Batches are returned in the order they were issued, so the
+    samples in flight are always the most recently issued ones.
+    window * batch_size may be no larger than the ring of
+    issued samples (ranksize), so none of them can be
+    overwritten in the ring before it comes back.
+
+    A NearExhaustionWarning is handled by carrying on with the
+    exhaustive sweep.  After a TotalExhaustionError no more
+    samples are issued, but the batches in flight, including
+    the partial batch issued with the error, are still
+    returned.
+
+    Returns the final MOEAState and a Throughput.
+    """
+    factory_args = kwargs.get("factory_args", tuple())
+    processes = kwargs.get("processes", None)
+    if processes is None:
+        processes = cpu_count()
+    batch_size = kwargs.get("batch_size", 8)
+    window = kwargs.get("window", 2 * processes)
+    if window * batch_size > len(state.issued.issues):
+        raise Exception(
+            "A window of {} batches of {} is more than the {} "
+            "outstanding samples the state can track.".format(
+                window, batch_size, len(state.issued.issues)))
+    start = time()
+    pool = Pool(processes, _initialize_worker, (factory, factory_args))
+    in_flight = deque()
+    issued = 0
+    returned = 0
+    exhausted = False
+    try:
+        while True:
+            while (not exhausted and issued < evaluations
+                   and len(in_flight) < window):
+                count = min(batch_size, evaluations - issued)
+                try:
+                    state, samples = get_samples(state, count)
+                except NearExhaustionWarning as ew:
+                    state = ew.state
+                    samples = ew.samples
+                except TotalExhaustionError as te:
+                    state = te.state
+                    samples = te.samples
+                    exhausted = True
+                if not samples:
+                    continue
+                # Samples are namedtuples of a type made up at run
+                # time, which can't be pickled.
+                decisions = [tuple(sample) for sample in samples]
+                in_flight.append(
+                    pool.apply_async(_evaluate_batch, (decisions,)))
+                issued += len(samples)
+            if not in_flight:
+                break
+            individuals = in_flight.popleft().get()
+            state = return_evaluated_individuals(state, individuals)
+            returned += len(individuals)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    seconds = time() - start
+    if seconds > 0:
+        rate = returned / seconds
+    else:
+        rate = float("inf")
+    return state, Throughput(returned, seconds, rate)
@@ -0,0 +1,143 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Speculative sample generation.  A Prefetcher keeps a queue
+of samples that have already been generated and issued, and
+tops it up after each tell, so that asking for a sample is
+just a matter of popping the queue.
+
+Queued samples are generated from the archive as it was when
+they were queued, so they're a little stale.  That's the
+price of taking sample generation off the ask path.
+"""
+
+from collections import deque
+
+from .Sampling import NearExhaustionWarning
+from .Sampling import TotalExhaustionError
+
+from .Functions import _withdraw
+
+class Prefetcher(object):
+    __slots__ = ("optimizer", "depth", "queue", "exhaustion")
+
+    def __init__(self, optimizer, depth=16):
+        """
+        optimizer (Optimizer): the optimizer to draw samples from
+        depth (int): number of samples to keep queued
+
+        Queued samples are outstanding, so depth plus the number
+        of samples out for evaluation should be no more than
+        the ring of issued samples (ranksize).
+        """
+        if depth > len(optimizer.issued.issues):
+            raise Exception(
+                "Depth {} is more than the {} outstanding samples "
+                "the optimizer can track.".format(
+                    depth, len(optimizer.issued.issues)))
+        self.optimizer = optimizer
+        self.depth = depth
+        self.queue = deque()
+        # An exhaustion exception from a refill, held until the
+        # queue runs dry
+        self.exhaustion = None
+        self.refill()
+
+    def ask(self):
+        """
+        Returns a sample in decision space.  Usually it comes
+        straight off the queue.  If the queue is empty, the
+        sample is generated on the spot.
+
+        NearExhaustionWarning and TotalExhaustionError are
+        raised as they are by Optimizer.ask, except that if a
+        refill runs into one, it's raised once the samples
+        queued before it have been handed out.
+        """
+        issue_index = self.optimizer.issued.issue_index
+        queue = self.queue
+        while queue:
+            key, sample = queue.popleft()
+            # A queued sample is only worth handing out if it's
+            # still outstanding: not returned in the meantime by
+            # a tell, and not overwritten in the ring.
+            if key in issue_index:
+                return sample
+        if self.exhaustion is not None:
+            exhaustion = self.exhaustion
+            self.exhaustion = None
+            raise exhaustion
+        return self.optimizer.ask()
+
+    def tell(self, individual):
+        """
+        individual (Individual): an evaluated individual
+
+        Accounts for the Individual and tops up the queue.
+        """
+        self.optimizer.tell(individual)
+        self.refill()
+
+    def refill(self):
+        """
+        Tops up the queue.  Call this when there's idle time to
+        spare, in addition to the refills after each tell.
+
+        Exhaustion stops refills until ask has raised it.
+        """
+        if self.exhaustion is not None:
+            return
+        optimizer = self.optimizer
+        queue = self.queue
+        while len(queue) < self.depth:
+            try:
+                queue.append(optimizer._ask_key())
+            except (NearExhaustionWarning, TotalExhaustionError) as ee:
+                self.exhaustion = ee
+                break
+
+    def cancel(self):
+        """
+        Withdraws every queued sample, so that they're no longer
+        outstanding.  Call this before handing the optimizer's
+        state to something else, or the queued samples stay
+        outstanding forever.
+        """
+        while self.queue:
+            key, _ = self.queue.popleft()
+            _withdraw(self.optimizer, key)
@@ -43,23 +43,72 @@ from .Constants import RANDOM
 from .Constants import EXHAUSTIVE
 from .Constants import EXHAUSTED
 
+from .Structures import Permutation
+
+from .Coverage import next_uncovered
+
+from .Structures import ArrayRank
+
 from math import floor
 from math import ceil
 
+from operator import mul
+
+from bisect import bisect_left
+
 class NearExhaustionWarning(Exception):
     def __init__(self, state, *args, **kwargs):
         super(NearExhaustionWarning, self).__init__(*args, **kwargs)
         self.state = state
+        # get_samples puts the part of its batch produced before
+        # the exception here.
+        self.samples = list()
 
 class TotalExhaustionError(Exception):
     def __init__(self, state, *args, **kwargs):
         super(TotalExhaustionError, self).__init__(*args, **kwargs)
         self.state = state
+        self.samples = list()
+
+def encode_grid_point(grid, grid_point):
+    """
+    grid (Grid)
+    grid_point (GridPoint or tuple of ints)
+
+    Returns the grid point as a single int, treating its
+    indices as the digits of a mixed-radix number with axis 0
+    as the least significant digit.  This is the same
+    numbering the EXHAUSTIVE DOE stage counts through.  Keys
+    hash and compare much faster than GridPoints with many
+    decisions, and they take much less space in sets.
+    """
+    return sum(map(mul, grid_point, grid.strides))
+
+def decode_grid_point(grid, key):
+    """
+    grid (Grid)
+    key (int): as returned by encode_grid_point
+
+    Returns the GridPoint encoded in the key.
+    """
+    indices = list()
+    for axis in grid.axes:
+        key, index = divmod(key, len(axis))
+        indices.append(index)
+    return grid.GridPoint(*indices)
 
 def is_duplicate(state, grid_point):
-    if grid_point in state.issued.issued_set:
+    return is_duplicate_key(state, encode_grid_point(state.grid, grid_point))
+
+def is_duplicate_key(state, key):
+    """
+    is_duplicate for a grid point that has already been
+    encoded.  Constant time, no matter how many decisions
+    there are.
+    """
+    if key in state.issued.issued_set:
         return True
-    if grid_point in state.archive_set:
+    if key in state.archive_set:
         return True
     #for rank in state.archive:
     #    counter = 0
@@ -127,52 +176,112 @@ def doe_next(state):
                 doestate = doestate._replace(stage=CENTERPOINT, counter=0)
             else:
                 doestate = doestate._replace(counter=advanced_counter)
+        elif stage == RANDOM and doestate.permutation is not None:
+            # Walk the permutation: each counter value maps to a
+            # different grid point, so once the counter reaches the
+            # number of grid points, we have visited them all.
+            total_points = grid.strides[-1] * len(grid.axes[-1])
+            if doestate.counter >= total_points:
+                doestate = doestate._replace(stage=EXHAUSTED, counter=0)
+                state = state._replace(doestate=doestate)
+                raise TotalExhaustionError(state)
+            grid_point = decode_grid_point(grid, permute(
+                doestate.permutation, total_points, doestate.counter))
+            doestate = doestate._replace(counter=doestate.counter + 1)
         elif stage in (RANDOM, EXHAUSTED):
             grid_point = grid.GridPoint(
                 *(state.randint(0, len(a) - 1) for a in grid.axes))
             # transition out of RANDOM is if we have too many failures
             doestate = doestate._replace(counter=doestate.counter + 1)
         elif stage == EXHAUSTIVE:
-            # Decompose the counter into indices, again treating axis
+            # The counter is a grid point key, so decoding it
+            # decomposes it into indices, again treating axis
             # 0 as the least significant because it's easy to write.
             # This also takes advantage of the fact that Python has
             # bignums.  In C we need to check overflow,
             # although if we overflow 2 ** 63 - 1, that means
             # we've sampled almost 1e19 grid points.  So good
             # for us, if we trip over that condition!
-            indices = list()
-            counter = doestate.counter
-            total_points = 1
-            for axis in grid.axes:
-                alen = len(axis)
-                total_points = total_points * alen # mind overflow here!
-                indices.append(counter % alen)
-                counter = counter // alen
-            advanced_counter = doestate.counter + 1
-            if advanced_counter >= total_points:
+            total_points = grid.strides[-1] * len(grid.axes[-1])
+            key = doestate.counter
+            if state.coverage is not None and key < total_points:
+                # Skip straight past the points already sampled.
+                key = next_uncovered(state.coverage, key)
+                if key is None:
+                    key = total_points
+            if key >= total_points:
                 doestate = doestate._replace(stage=EXHAUSTED, counter=0)
                 state = state._replace(doestate=doestate)
                 raise TotalExhaustionError(state)
-            else:
-                doestate = doestate._replace(counter=advanced_counter)
+            grid_point = decode_grid_point(grid, key)
+            doestate = doestate._replace(counter=key + 1)
         if stage == EXHAUSTED:
             # No point in wasting time on a duplicate check, and
             # if we're exhausted the loop condition will remain true
             # forever.
             break
         duplicated = is_duplicate(state, grid_point)
-        if duplicated and stage == RANDOM:
+        if duplicated and stage == RANDOM and doestate.permutation is None:
             duplicates_generated += 1
             # How hard do we want to try here?  This says if the space
             # is more than 99.9% sampled on average we should move over
             # to exhaustive search.
             if duplicates_generated > 1000:
-                doestate = doestate._replace(stage=EXHAUSTIVE)
+                doestate = doestate._replace(stage=EXHAUSTIVE, counter=0)
                 state = state._replace(doestate=doestate)
                 raise NearExhaustionWarning(state)
     state = state._replace(doestate=doestate)
     return state, grid_point
 
+def new_permutation(grid, randint):
+    """
+    grid (Grid)
+    randint (callable): as in MOEAState
+
+    Returns a Permutation of the grid's keys with random round
+    keys.
+    """
+    total_points = grid.strides[-1] * len(grid.axes[-1])
+    # The Feistel network permutes a domain of an even number
+    # of bits.  It's less than four times larger than the grid,
+    # so cycle walking takes a few steps at most on average.
+    bits = max(2, (total_points - 1).bit_length())
+    bits += bits % 2
+    half_bits = bits // 2
+    keys = tuple(randint(0, (1 << half_bits) - 1) for _ in range(4))
+    return Permutation(half_bits, keys)
+
+def permute(permutation, size, index):
+    """
+    permutation (Permutation)
+    size (int): the number of grid points
+    index (int): 0 <= index < size
+
+    Returns where the permutation sends index.  Different
+    indices go to different keys, all less than size.
+    """
+    value = _feistel(permutation, index)
+    # Cycle walking: the network permutes a larger domain, so
+    # if we land outside the grid we keep going until we come
+    # back in.  This is still a bijection on the grid.
+    while value >= size:
+        value = _feistel(permutation, value)
+    return value
+
+def _feistel(permutation, value):
+    half_bits = permutation.half_bits
+    mask = (1 << half_bits) - 1
+    shift = max(1, half_bits // 2)
+    left = value >> half_bits
+    right = value & mask
+    for key in permutation.keys:
+        # Any function of the right half will do for the round
+        # function, as long as it mixes well.
+        mixed = (right * (2 * key + 1) + key) & mask
+        mixed ^= mixed >> shift
+        left, right = right, left ^ mixed
+    return (left << half_bits) | right
+
 def evolve(state):
     """
     state (MOEAState)
@@ -181,7 +290,8 @@ def evolve(state):
     variation.  It is the primary means by which we search for
     superior individuals in the problem space.
     """
-    total_archive_occupancy = sum(r.occupancy for r in state.archive)
+    total_archive_occupancy = state.archive_stats.total_occupancy
+    occupied_ranks = state.archive_stats.occupied_ranks
     # if archive is too small, return doe_next
     if total_archive_occupancy < 2:
         return doe_next(state)
@@ -191,11 +301,21 @@ def evolve(state):
     # is to be selected for Parent B.
     ramp = -1
 
+    strides = state.grid.strides
+
     duplicated = True
     circuit_breaker = 0
     while duplicated and circuit_breaker < 10:
         # Select parent A from rank 0.  Parents A and B are grid points.
         parent_a = _select(state, 0)
+        # Keys are linear in the indices, so we keep the
+        # offspring's key up to date as we change it rather
+        # than re-encoding the whole grid point.
+        offspring_key = encode_grid_point(state.grid, parent_a)
+        # The offspring is a list of indices that we change in
+        # place.  It only becomes a GridPoint once we're sure
+        # we're going to issue it.
+        offspring = list(parent_a)
         if randint(1, 10) == 1:
             # do continuous injection
             draw = randint(0, 99)
@@ -206,7 +326,6 @@ def evolve(state):
                 if draw >= limit or count == len(parent_a):
                     n_dv_to_modify = count
                     break
-            offspring = parent_a
             while n_dv_to_modify > 0:
                 n_dv_to_modify -= 1
                 dv_index = randint(0, len(parent_a) - 1)
@@ -214,7 +333,6 @@ def evolve(state):
                     # don't repeat yourself
                     dv_index = randint(0, len(parent_a) - 1)
                 axis = state.grid.axes[dv_index]
-                field = offspring._fields[dv_index]
                 # uniform random mutation, different sense
                 # of the word "index"
                 new_index = randint(0, len(axis) - 2)
@@ -222,7 +340,9 @@ def evolve(state):
                 # (hence the -2 above)
                 if new_index >= offspring[dv_index]:
                     new_index += 1
-                offspring = offspring._replace(**{field: new_index})
+                offspring_key += (
+                    (new_index - offspring[dv_index]) * strides[dv_index])
+                offspring[dv_index] = new_index
         else:
             # do SBX
             parent_b = parent_a
@@ -234,7 +354,7 @@ def evolve(state):
                 # This is a lot more like a mutation operator with a 1/ndv rate
                 # than a traditional crossover operator.  But like DE, it is using
                 # the population to determine an appropriate step size.
-                rank_b = _select_rank(state, ramp)
+                rank_b = _select_rank(state, ramp, occupied_ranks)
                 ramp += 1
                 # Choose parent B from its rank.
                 parent_b = _select(state, rank_b)
@@ -268,7 +388,6 @@ def evolve(state):
                     break
 
             # Apply SBX 
-            offspring = parent_a
             previous_dv = -1
             while n_dv_to_modify > 0:
                 # randomly select from the unequal decision variables
@@ -287,11 +406,12 @@ def evolve(state):
                     offspring[target_index],
                     parent_b[target_index],
                     len(state.grid.axes[target_index]),
-                    state.random)
+                    state.random,
+                    state.distribution_index)
 
-                # Look up the name of the field so we can do _replace
-                field = offspring._fields[target_index]
-                offspring = offspring._replace(**{field: result})
+                offspring_key += (
+                    (result - offspring[target_index]) * strides[target_index])
+                offspring[target_index] = result
 
                 # Prepare for next iteration
                 n_dv_to_modify -= 1
@@ -301,7 +421,8 @@ def evolve(state):
 
         # Treat the offspring as a direction for a line search.
         # If the offspring is not duplicated, we'll just get it back.
-        offspring, duplicated = _line_search(state, parent_a, offspring)
+        offspring, duplicated = _line_search(
+            state, parent_a, offspring, offspring_key)
 
         # Increment the "circuit breaker" so that we don't line search
         # forever in a saturated space
@@ -310,23 +431,22 @@ def evolve(state):
     # If everything failed, return a doe point
     if duplicated:
         return doe_next(state)
-    return state, offspring
+    return state, state.grid.GridPoint(*offspring)
 
-def sbx_index(aa, bb, allowed, random):
+def sbx_index(aa, bb, allowed, random, di=1.0):
     """
     Perform SBX on indices.  Return a new index.
 
-    TODO: allow to parameterize DI.
-
     aa (int >= 0): an index
     bb (int >= 0): an index
     allowed (int > 1): number of allowed indices
+    di (float, nonnegative): distribution index
     """
     if allowed == 1:
         raise Exception("This operation will always return 0!")
     rounded_result = aa
     while rounded_result == aa:
-        result = sbx(0.0, float(allowed-1), float(aa), float(bb), 1.0, random)
+        result = sbx(0.0, float(allowed-1), float(aa), float(bb), di, random)
         difference = result - aa
         if difference > 0:
             rounded_result = aa + int(ceil(difference))
@@ -379,18 +499,20 @@ def sbx(x_lower, x_upper, x_parent1, x_parent2, di, random):
     x_child = x_lower + x_range * y_child
     return x_child
 
-def _line_search(state, parent, offspring):
+def _line_search(state, parent, offspring, offspring_key):
     """
     state (MOEAState)
     parent (GridPoint)
-    offspring (GridPoint)
+    offspring (list of int): indices of the offspring grid point
+    offspring_key (int): encode_grid_point of offspring
 
     Do a line search in the parent->offspring direction
 
-    Return a grid point and whether or not that point is duplicated.
-    (grid_point, duplicated)
+    Return a list of grid point indices and whether or not that
+    point is duplicated.
+    (indices, duplicated)
     """
-    if not is_duplicate(state, offspring):
+    if not is_duplicate_key(state, offspring_key):
         return offspring, False
     # See comment in evolve() about stack allocation versus heap
     # allocation for "working" indices and flags.
@@ -398,55 +520,52 @@ def _line_search(state, parent, offspring):
     abstep = [abs(s) for s in step]
     signstep = [(int(s >= 0) * 2 - 1) * int(s != 0) for s in step]
     threshold = max(abstep)
-    counters = [0 for _ in abstep]
-    duplicated = True
-    location = [o for o in offspring]
-    search_result = offspring
-    # Search further out from offspring
-    failed = False
-    while duplicated and not failed:
-        failed = False
-        for ii in range(len(counters)):
-            counters[ii] += abstep[ii]
-            if counters[ii] >= threshold:
-                counters[ii] = counters[ii] % threshold
-                location[ii] = location[ii] + signstep[ii]
-                if location[ii] < 0:
-                    failed = True
-                elif location[ii] >= len(state.grid.axes[ii]):
-                    failed = True
-        search_result = state.grid.GridPoint(*location)
-        duplicated = is_duplicate(state, search_result)
-    if duplicated or failed:
-        # Search toward parent from offspring
-        location = [o for o in offspring]
-        counters = [0 for _ in abstep]
-        search_result = offspring
-        failed = False
-        duplicated = True
-        while duplicated and not failed:
-            failed = False
-            for ii in range(len(counters)):
-                counters[ii] += abstep[ii]
-                if counters[ii] >= threshold:
-                    counters[ii] = counters[ii] % threshold
-                    location[ii] = location[ii] - signstep[ii]
-                    if location[ii] < 0:
-                        failed = True
-                    elif location[ii] >= len(state.grid.axes[ii]):
-                        failed = True
-            search_result = state.grid.GridPoint(*location)
-            duplicated = is_duplicate(state, search_result)
-
-    if failed or duplicated:
-        return offspring, True
-    else:
-        return search_result, False
-
-def _select_rank(state, ramp):
+    # Only the decisions that differ from the parent ever move,
+    # and there are at most seven of them.
+    moving = [ii for ii in range(len(step)) if abstep[ii] != 0]
+    axis_lengths = [len(a) for a in state.grid.axes]
+    strides = state.grid.strides
+    issued_set = state.issued.issued_set
+    archive_set = state.archive_set
+    # Search further out from offspring, then toward parent
+    # from offspring.
+    for direction in (1, -1):
+        # This is Bresenham-style stepping: after t steps,
+        # decision ii has moved floor(t * abstep / threshold)
+        # indices, so each key on the line can be worked out
+        # directly.  The line ends at the last step before any
+        # decision leaves the grid, but most searches stop at
+        # the first step or two, so the keys are made one at a
+        # time as we go.
+        last_step = None
+        for ii in moving:
+            if direction * signstep[ii] > 0:
+                room = axis_lengths[ii] - 1 - offspring[ii]
+            else:
+                room = offspring[ii]
+            steps = ((room + 1) * threshold - 1) // abstep[ii]
+            if last_step is None or steps < last_step:
+                last_step = steps
+        key_steps = [direction * signstep[ii] * strides[ii] for ii in moving]
+        for tt in range(1, last_step + 1):
+            key = offspring_key
+            for key_step, ii in zip(key_steps, moving):
+                key += key_step * (tt * abstep[ii] // threshold)
+            if key in issued_set or key in archive_set:
+                continue
+            location = list(offspring)
+            for ii in moving:
+                location[ii] += (direction * signstep[ii]
+                                 * (tt * abstep[ii] // threshold))
+            return location, False
+    return offspring, True
+
+def _select_rank(state, ramp, occupied_ranks):
     """
     ramp (float): Weighting ramp for relative rank probability.
                   Ramp is greater than or equal to -1.
+    occupied_ranks (int): number of ranks before the first
+                  empty one
 
     Returns the index of a rank to sample.
     """
@@ -454,20 +573,36 @@ def _select_rank(state, ramp):
         pass # in the domain
     else:
         raise Exception("Ramp {} is not greater than -1".format(ramp))
-    occupied_ranks = 0
-    for rank in state.archive:
-        if rank.occupancy == 0:
-            break
-        occupied_ranks += 1
-    # see elsewhere discussion about stack allocation
-    intervals = [occupied_ranks + ramp * ii for ii in range(occupied_ranks)]
-    breaks = [sum(intervals[:(ii+1)]) for ii in range(occupied_ranks)]
+    breaks = _selection_table(state, ramp, occupied_ranks)
     limit = breaks[-1]
     selection = state.randint(0, limit)
-    rank_number = 0
-    while breaks[rank_number] < selection:
-        rank_number += 1
-    return rank_number
+    # the first rank whose break is at least the selection
+    return bisect_left(breaks, selection)
+
+def _selection_table(state, ramp, occupied_ranks):
+    """
+    Returns the cumulative weights of the occupied ranks for
+    a given ramp.  The tables only depend on the ramp and the
+    number of occupied ranks, so we keep them in
+    state.selection_tables until the number of occupied ranks
+    changes.
+    """
+    tables = state.selection_tables
+    tables_by_ramp = tables.get(occupied_ranks)
+    if tables_by_ramp is None:
+        tables.clear()
+        tables_by_ramp = dict()
+        tables[occupied_ranks] = tables_by_ramp
+    breaks = tables_by_ramp.get(ramp)
+    if breaks is None:
+        # see elsewhere discussion about stack allocation
+        breaks = list()
+        total = 0
+        for ii in range(occupied_ranks):
+            total += occupied_ranks + ramp * ii
+            breaks.append(total)
+        tables_by_ramp[ramp] = breaks
+    return breaks
 
 def _select(state, rank_number):
     """
@@ -483,19 +618,9 @@ def _select(state, rank_number):
         raise Exception("Can't select from an empty rank ({}).".format(rank_number))
     randint = state.randint
     target = randint(0, rank.occupancy - 1)
-    counter = -1
-    index = -1
-    while counter < target:
-        index += 1
-        if rank.individuals[index].valid:
-            counter += 1
-        if index > len(rank.individuals):
-            # Should never get here because occupancy is the number
-            # of valid individuals in the rank.  If we do, it's because
-            # of a bookkeeping failure somewhere else.  Probably in
-            # move_individual.  Be very careful about updating the
-            # contents of rank.individuals, because it's mutable!  Old
-            # Ranks will be wrong about occupancy.
-            raise Exception("Rank {} is inconsistent!".format(rank_number))
+    # The valid slots are packed at the front of rank.slots,
+    # so no scanning is needed.
+    index = rank.slots[target]
+    if isinstance(rank, ArrayRank):
+        return state.grid.GridPoint(*rank.grid_points[index].tolist())
     return rank.individuals[index].grid_point
-
@@ -0,0 +1,606 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+A sample server, so that evaluators in other processes or on
+other hosts can pull samples from one optimizer and push
+evaluated individuals back.
+
+The server owns the MOEAState and runs in one thread, so no
+locking is needed.  It talks to any number of clients over
+TCP or Unix sockets with a small binary protocol.  Every
+message is a frame: a 4-byte big-endian length, then that
+many bytes of payload.  The first byte of the payload is an
+opcode and the rest is the body.  All counts are big-endian
+unsigned 32-bit integers, and all values are big-endian
+doubles.
+
+    opcode  request body            reply body
+    I       (none)                  decisions, objectives,
+                                    constraints, tagalongs
+                                    (the size of each)
+    A       count                   n, then n samples
+    T       n, then n individuals   n
+
+An individual is its decisions, objectives, constraints, and
+tagalongs, in that order.  An ask may be answered with fewer
+samples than requested, and zero samples means the server has
+none left to give.  A request the server can't handle is
+answered with opcode R and a UTF-8 error message.
+
+Clients may send several requests without waiting for the
+replies; the replies to each connection's requests come back
+in order.  The state can only keep track of as many
+outstanding samples as its ring of issues holds.  An ask is
+answered with no more samples than there are free slots ahead
+in the ring before one still out with a worker, and if there
+are none it waits until tells make room for it.
+Requests behind a waiting ask are still handled, so its
+connection's tells can make the room, but their replies wait
+their turn.  When a connection closes, the samples it was
+given and hasn't told are withdrawn, so that they can be
+issued again.
+"""
+
+from collections import namedtuple
+from collections import deque
+
+from select import select
+
+from time import time
+
+from struct import pack
+from struct import unpack
+from struct import unpack_from
+
+import errno
+import os
+import socket
+
+from .Structures import Individual
+
+from .Functions import get_samples
+from .Functions import return_evaluated_individuals
+from .Functions import decisions_to_grid_point
+from .Functions import _withdraw
+
+from .Sampling import encode_grid_point
+
+from .Sampling import NearExhaustionWarning
+from .Sampling import TotalExhaustionError
+
+INFO = b"I"
+ASK = b"A"
+TELL = b"T"
+ERROR = b"R"
+
+_HEADER = ">I"
+_HEADER_SIZE = 4
+
+# Seconds to spend sending the last replies before serve returns
+_FLUSH_TIMEOUT = 1.0
+
+# _Connection: a client connection and its buffers.  The
+# bytearrays and the deque are modified in place.
+_Connection = namedtuple("_Connection", (
+    "socket",       # the client socket
+    "incoming",     # bytearray of received bytes not yet handled
+    "outgoing",     # bytearray of reply bytes not yet sent
+    "replies",      # deque of one-element lists, one per request
+                    # in order, holding the framed reply or None
+                    # while the request is an ask that waits
+))
+
+def _frame(opcode, body):
+    return pack(_HEADER, len(opcode) + len(body)) + opcode + body
+
+def _pack_values(values):
+    return pack(">{}d".format(len(values)), *values)
+
+def _unpack_values(data, offset, count):
+    return unpack_from(">{}d".format(count), data, offset)
+
+def _new_socket(address):
+    """
+    address (tuple or str): (host, port) for TCP, or a path
+                     for a Unix socket
+    """
+    if isinstance(address, tuple):
+        return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+class SampleServer(object):
+    def __init__(self, state, address, backlog=64):
+        """
+        state (MOEAState): the state to serve samples from
+        address (tuple or str): (host, port) to listen on TCP,
+                     or a path to listen on a Unix socket.  A
+                     port of 0 picks a free port; the address
+                     member has the real one.
+        backlog (int): number of pending connections to queue
+        """
+        self.state = state
+        self.listener = _new_socket(address)
+        if isinstance(address, tuple):
+            self.listener.setsockopt(
+                socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen(backlog)
+        self.listener.setblocking(0)
+        self.address = self.listener.getsockname()
+        self.connections = dict()
+        self.issued = 0
+        self.told = 0
+        self.exhausted = False
+        self._budget = None
+        # key -> connection for each sample issued and not told
+        self._outstanding = dict()
+        # whether an empty reply has told a worker to stop
+        self._stopped = False
+        # (connection, reply, count) for each ask waiting for
+        # room in the ring, in the order they arrived
+        self._waiting = deque()
+
+    def serve(self, evaluations=None, timeout=None):
+        """
+        evaluations (int): number of samples to issue, or None
+                     to keep issuing until the grid is exhausted
+        timeout (float): seconds to wait for activity before
+                     giving up, or None to wait forever
+
+        Handles requests until every sample that is going to
+        be issued has been issued and told, or until nothing
+        happens for timeout seconds.  Once the samples run out,
+        asks are answered with zero samples, which tells the
+        workers to stop.  Samples withdrawn from a closed
+        connection don't count as issued, unless workers have
+        already been told to stop, in which case nobody is left
+        to take them.  May be called again to carry on.
+
+        Returns the current MOEAState.
+        """
+        if evaluations is None:
+            self._budget = None
+        else:
+            self._budget = self.issued + evaluations
+        self._stopped = False
+        while not self._finished():
+            readers = [self.listener] + list(self.connections)
+            writers = [s for s, c in self.connections.items() if c.outgoing]
+            readable, writable, _ = select(readers, writers, [], timeout)
+            if not (readable or writable):
+                break
+            for sock in writable:
+                self._send(self.connections[sock])
+            for sock in readable:
+                if sock is self.listener:
+                    self._accept()
+                elif sock in self.connections:
+                    self._receive(self.connections[sock])
+        self._flush()
+        return self.state
+
+    def close(self):
+        """
+        Closes every connection and stops listening.
+        """
+        self._waiting.clear()
+        for connection in list(self.connections.values()):
+            self._drop(connection)
+        self.listener.close()
+        if not isinstance(self.address, tuple):
+            os.unlink(self.address)
+
+    def _out_of_samples(self):
+        return self.exhausted or (
+            self._budget is not None and self.issued >= self._budget)
+
+    def _finished(self):
+        return self._out_of_samples() and not self._outstanding
+
+    def _accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except socket.error as se:
+            if se.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        sock.setblocking(0)
+        if sock.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections[sock] = _Connection(
+            sock, bytearray(), bytearray(), deque())
+
+    def _drop(self, connection):
+        if connection.socket not in self.connections:
+            return
+        del self.connections[connection.socket]
+        connection.socket.close()
+        withdrawn = [key for key, holder in self._outstanding.items()
+                     if holder is connection]
+        for key in withdrawn:
+            del self._outstanding[key]
+            _withdraw(self.state, key)
+        if not self._stopped:
+            self.issued -= len(withdrawn)
+        self._waiting = deque(
+            waiting for waiting in self._waiting
+            if waiting[0] is not connection)
+        # The withdrawn samples may have made room for asks from
+        # other connections.
+        self._answer_waiting()
+
+    def _receive(self, connection):
+        try:
+            data = connection.socket.recv(1 << 16)
+        except socket.error:
+            self._drop(connection)
+            return
+        if not data:
+            self._drop(connection)
+            return
+        incoming = connection.incoming
+        incoming.extend(data)
+        offset = 0
+        while len(incoming) - offset >= _HEADER_SIZE:
+            length, = unpack_from(_HEADER, incoming, offset)
+            end = offset + _HEADER_SIZE + length
+            if len(incoming) < end:
+                break
+            payload = bytes(incoming[offset + _HEADER_SIZE:end])
+            self._request(connection, payload)
+            offset = end
+        del incoming[:offset]
+        self._answer_waiting()
+        self._reply(connection)
+
+    def _request(self, connection, payload):
+        """
+        payload (bytes): a request, without its length
+
+        Handles the request, or queues it if it is an ask.
+        """
+        reply = [None]
+        connection.replies.append(reply)
+        if payload[:1] == ASK and len(payload) == 5:
+            count, = unpack_from(">I", payload, 1)
+            self._waiting.append((connection, reply, count))
+        else:
+            reply[0] = self._handle(connection, payload)
+
+    def _room(self, count):
+        """
+        Returns how many of count samples can be issued without
+        overwriting outstanding ones in the ring.  Tells can come
+        back in any order, so this is the run of free slots from
+        the ring's next index up to the first one still out with
+        a worker, not just the number of free slots.
+        """
+        issues = self.state.issued.issues
+        index = self.state.issued.index
+        room = 0
+        while room < min(count, len(issues)):
+            issue = issues[index]
+            if issue.outstanding and issue.key in self._outstanding:
+                break
+            room += 1
+            index = (index + 1) % len(issues)
+        return room
+
+    def _answer_waiting(self):
+        """
+        Answers waiting asks in order, for as long as there is
+        room in the ring or there are no samples left to give.
+        """
+        while self._waiting:
+            connection, reply, count = self._waiting[0]
+            room = self._room(count)
+            if count > 0 and room == 0 and not self._out_of_samples():
+                break
+            self._waiting.popleft()
+            reply[0] = self._handle(connection, ASK + pack(">I", room))
+            if connection.replies[0] is reply:
+                self._reply(connection)
+
+    def _reply(self, connection):
+        """
+        Moves the connection's finished replies to its outgoing
+        buffer, up to the first one that is still waiting, and
+        starts sending them.
+        """
+        replies = connection.replies
+        while replies and replies[0][0] is not None:
+            connection.outgoing.extend(replies.popleft()[0])
+        if connection.outgoing:
+            self._send(connection)
+
+    def _send(self, connection):
+        try:
+            sent = connection.socket.send(connection.outgoing)
+        except socket.error as se:
+            if se.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            self._drop(connection)
+            return
+        del connection.outgoing[:sent]
+
+    def _flush(self):
+        """
+        Sends any replies that are still buffered, so that the
+        last tells are acknowledged before serve returns.  A
+        client that isn't reading can't hold the server up for
+        more than _FLUSH_TIMEOUT seconds; whatever is left is
+        sent the next time serve is called.
+        """
+        deadline = time() + _FLUSH_TIMEOUT
+        while True:
+            writers = [s for s, c in self.connections.items() if c.outgoing]
+            remaining = deadline - time()
+            if not writers or remaining <= 0:
+                break
+            _, writable, _ = select([], writers, [], remaining)
+            for sock in writable:
+                if sock in self.connections:
+                    self._send(self.connections[sock])
+
+    def _handle(self, connection, payload):
+        """
+        connection (_Connection): the connection the request
+                     came in on
+        payload (bytes): a request, without its length
+
+        Returns the framed reply.
+        """
+        opcode = payload[:1]
+        try:
+            if opcode == ASK:
+                count, = unpack_from(">I", payload, 1)
+                samples = self._ask(connection, count)
+                values = [value for sample in samples for value in sample]
+                return _frame(
+                    ASK, pack(">I", len(samples)) + _pack_values(values))
+            elif opcode == TELL:
+                count = self._tell(payload)
+                return _frame(TELL, pack(">I", count))
+            elif opcode == INFO:
+                problem = self.state.problem
+                return _frame(INFO, pack(
+                    ">4I",
+                    len(problem.decisions),
+                    len(problem.objectives),
+                    len(problem.constraints),
+                    len(problem.tagalongs)))
+            raise Exception("Unknown opcode {!r}".format(opcode))
+        except Exception as ee:
+            return _frame(ERROR, "{}".format(ee).encode("utf-8"))
+
+    def _ask(self, connection, count):
+        """
+        Returns up to count samples, fewer if the budget or the
+        grid runs out, and records them as outstanding with the
+        connection.
+        """
+        if self._budget is not None:
+            count = min(count, self._budget - self.issued)
+        samples = list()
+        while len(samples) < count and not self.exhausted:
+            try:
+                self.state, batch = get_samples(
+                    self.state, count - len(samples))
+            except NearExhaustionWarning as ew:
+                self.state = ew.state
+                batch = ew.samples
+            except TotalExhaustionError as te:
+                self.state = te.state
+                batch = te.samples
+                self.exhausted = True
+            samples.extend(batch)
+        if not samples and self._out_of_samples():
+            self._stopped = True
+        for sample in samples:
+            self._outstanding[self._key(sample)] = connection
+        self.issued += len(samples)
+        return samples
+
+    def _key(self, decisions):
+        grid = self.state.grid
+        return encode_grid_point(
+            grid, decisions_to_grid_point(grid, decisions))
+
+    def _tell(self, payload):
+        """
+        Returns the number of individuals in the TELL request.
+        """
+        problem = self.state.problem
+        sizes = (len(problem.decisions), len(problem.objectives),
+                 len(problem.constraints), len(problem.tagalongs))
+        count, = unpack_from(">I", payload, 1)
+        if len(payload) != 5 + 8 * count * sum(sizes):
+            raise Exception("Malformed TELL of {} individuals".format(count))
+        values = _unpack_values(payload, 5, count * sum(sizes))
+        individuals = list()
+        offset = 0
+        for _ in range(count):
+            parts = list()
+            for size in sizes:
+                parts.append(values[offset:offset + size])
+                offset += size
+            individuals.append(Individual(*parts))
+        self.state = return_evaluated_individuals(self.state, individuals)
+        for individual in individuals:
+            self._outstanding.pop(self._key(individual.decisions), None)
+        self.told += count
+        return count
+
+class SampleClient(object):
+    def __init__(self, address):
+        """
+        address (tuple or str): the SampleServer's address
+        """
+        self.socket = _new_socket(address)
+        self.socket.connect(address)
+        if self.socket.family == socket.AF_INET:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._incoming = bytearray()
+        self._send(INFO, b"")
+        self.sizes = self._receive(INFO)
+
+    def ask(self, count=1):
+        """
+        count (int): number of samples to ask for
+
+        Returns a list of samples, each a tuple of decision
+        values.  There may be fewer than count, and an empty
+        list means the server has no more samples to give.
+        """
+        self.send_ask(count)
+        return self.receive_ask()
+
+    def tell(self, individuals):
+        """
+        individuals (sequence of Individual): evaluated
+                     individuals to return to the server
+        """
+        self.send_tell(individuals)
+        self.receive_tell()
+
+    def send_ask(self, count=1):
+        """
+        Sends an ask without waiting for the reply.  Collect the
+        reply later with receive_ask; replies come back in the
+        order the requests were sent.
+        """
+        self._send(ASK, pack(">I", count))
+
+    def send_tell(self, individuals):
+        """
+        Sends a tell without waiting for the reply.  Collect the
+        reply later with receive_tell.
+        """
+        values = list()
+        for individual in individuals:
+            for part, size in zip(individual, self.sizes):
+                if len(part) != size:
+                    raise Exception(
+                        "Individual has {} values where {} were "
+                        "expected".format(len(part), size))
+                values.extend(part)
+        self._send(TELL, pack(">I", len(individuals)) + _pack_values(values))
+
+    def receive_ask(self):
+        """
+        Returns the samples from the next reply, which must be
+        to an ask.
+        """
+        payload = self._receive(ASK)
+        count, = unpack_from(">I", payload, 0)
+        ndv = self.sizes[0]
+        values = _unpack_values(payload, 4, count * ndv)
+        return [values[ii * ndv:(ii + 1) * ndv] for ii in range(count)]
+
+    def receive_tell(self):
+        """
+        Returns the number of individuals acknowledged by the
+        next reply, which must be to a tell.
+        """
+        count, = unpack(">I", self._receive(TELL))
+        return count
+
+    def close(self):
+        self.socket.close()
+
+    def _send(self, opcode, body):
+        self.socket.sendall(_frame(opcode, body))
+
+    def _receive(self, opcode):
+        """
+        Returns the body of the next reply, or its contents for
+        INFO.  Raises EOFError if the server has closed the
+        connection.
+        """
+        length, = unpack(_HEADER, self._read(_HEADER_SIZE))
+        payload = self._read(length)
+        if payload[:1] == ERROR:
+            raise Exception(payload[1:].decode("utf-8"))
+        if payload[:1] != opcode:
+            raise Exception("Expected a reply to {!r} but got one to {!r}"
+                            .format(opcode, payload[:1]))
+        if opcode == INFO:
+            return unpack(">4I", payload[1:])
+        return payload[1:]
+
+    def _read(self, size):
+        incoming = self._incoming
+        while len(incoming) < size:
+            data = self.socket.recv(1 << 16)
+            if not data:
+                raise EOFError("The server closed the connection.")
+            incoming.extend(data)
+        data = bytes(incoming[:size])
+        del incoming[:size]
+        return data
+
+def run_worker(address, evaluate, batch_size=1):
+    """
+    address (tuple or str): the SampleServer's address
+    evaluate (callable): takes a tuple of decision values and
+                     returns an evaluated Individual
+    batch_size (int): number of samples to ask for at a time
+
+    Asks for samples, evaluates them, and tells the results
+    until the server runs out of samples or goes away.  The
+    next ask is sent along with each tell, so there is one
+    round trip per batch.
+
+    Returns the number of individuals evaluated.
+    """
+    client = SampleClient(address)
+    evaluated = 0
+    try:
+        client.send_ask(batch_size)
+        while True:
+            samples = client.receive_ask()
+            if not samples:
+                break
+            client.send_tell([evaluate(sample) for sample in samples])
+            client.send_ask(batch_size)
+            evaluated += client.receive_tell()
+    except EOFError:
+        pass
+    finally:
+        client.close()
+    return evaluated
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+"""
+Slot bookkeeping shared by both kinds of Rank.
+
+Each rank keeps "slots", a permutation of its slot indices,
+and "positions", the inverse permutation.  The first
+"occupancy" entries of slots are the slots holding valid
+individuals, packed densely.  The rest are the free slots,
+used as a stack whose top is slots[occupancy].  Keeping the
+valid slots packed makes picking a random individual or a
+free slot a single index, and the swaps below keep both
+arrays up to date in constant time.
+
+These functions work the same on lists, array.array, and
+numpy arrays.
+"""
+
+def occupy_slot(slots, positions, occupancy, slot):
+    """
+    Mark a free slot as valid.
+
+    Returns the new occupancy.
+    """
+    position = positions[slot]
+    boundary_slot = slots[occupancy]
+    slots[position] = boundary_slot
+    positions[boundary_slot] = position
+    slots[occupancy] = slot
+    positions[slot] = occupancy
+    return occupancy + 1
+
+def vacate_slot(slots, positions, occupancy, slot):
+    """
+    Mark a valid slot as free.
+
+    Returns the new occupancy.
+    """
+    last = occupancy - 1
+    position = positions[slot]
+    last_slot = slots[last]
+    slots[position] = last_slot
+    positions[last_slot] = position
+    slots[last] = slot
+    positions[slot] = last
+    return last
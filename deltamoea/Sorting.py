@@ -35,30 +35,85 @@ OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 POSSIBILITY OF SUCH DAMAGE.
 """
 
+from array import array
+
 from .Constants import MAXIMIZE
 from .Constants import MINIMIZE
 from .Constants import LEFT_DOMINATES
 from .Constants import RIGHT_DOMINATES
 from .Constants import NEITHER_DOMINATES
 
+from .Constants import RETAIN
+
+from .Structures import Rank
+from .Structures import ArrayRank
+from .Structures import ArchiveIndividual
+from .Structures import ArchiveStats
+
+from .Arrays import clear_array_rank
+from .Arrays import valid_array_indices
+from .Arrays import array_rank_individual
+from .Arrays import store_array_individual
+from .Arrays import move_array_individual
+from .Arrays import fill_array_rank_from_rank
+from .Arrays import grow_array_rank
+from .Arrays import sort_array_individual
+from .Arrays import array_nondominated_fronts
+from .Arrays import numpy
+
+from .Sampling import encode_grid_point
+
+from .Coverage import uncover
+
+from .Slots import occupy_slot
+from .Slots import vacate_slot
+
 from math import isnan
 
 def sort_into_archive(state, archive_individual):
+    return sort_front_into_archive(state, (archive_individual,))
+
+def sort_front_into_archive(state, archive_individuals):
+    """
+    state (MOEAState)
+    archive_individuals (sequence of ArchiveIndividual): individuals
+        none of which dominates any other, no more of them than
+        fit in a rank
+
+    Sort several mutually nondominated individuals into the
+    archive at once.  This is exactly what happens to the
+    individuals displaced from one rank into the next, so it
+    costs one pass over the archive instead of one per
+    individual.
+
+    Returns the updated MOEAState.
+    """
     archive = state.archive
+    # Only the ranks we pass through and the last one change, so
+    # the stats are updated as we go instead of recounted.
+    rank_sizes = list(state.archive_stats.rank_sizes)
 
-    rank_A = state.rank_A._replace(occupancy=0)
-    rank_B = state.rank_B._replace(occupancy=0)
+    rank_A = _clear_rank(state.rank_A)
+    rank_B = _clear_rank(state.rank_B)
 
     # rank A will always be the one we're sorting into
     # the next archive rank, and rank B will be the
     # recipient of displaced individuals.
-    rank_A.individuals[0] = archive_individual
-    rank_A = rank_A._replace(occupancy=1)
+    rank_A = _reserve(state, rank_A, len(archive_individuals))
+    for archive_individual in archive_individuals:
+        rank_A = _store_individual(rank_A, archive_individual)
 
     rank_into = 0
     # loop over archive ranks
     while rank_A.occupancy > 0 and rank_into + 1 < len(archive):
+        # Make room for everything that could land in "into"
+        # or in rank B on this pass, in case they were lazily
+        # allocated.
         into = archive[rank_into]
+        into = _reserve(state, into, into.occupancy + rank_A.occupancy)
+        rank_B = _reserve(
+            state, rank_B,
+            rank_B.occupancy + into.occupancy + rank_A.occupancy)
         # print("----")
         # print("before: rank {}".format(rank_into))
         # _print_rank(into)
@@ -67,35 +122,9 @@ def sort_into_archive(state, archive_individual):
         # print("before: rank_B")
         # _print_rank(rank_B)
         # loop over rank A
-        a_remaining = rank_A.occupancy
-        for ai, a_ind in enumerate(rank_A.individuals):
-            # print("processing {} from rank A: {}".format(ai, a_ind))
-            if a_remaining <= 0:
-                break
-            if not a_ind.valid:
-                continue
-            a_remaining -= 1
-            # loop over rank being sorted into
-            i_remaining = into.occupancy
-            for ii, i_ind in enumerate(into.individuals):
-                if i_remaining <= 0:
-                    break
-                if not i_ind.valid:
-                    continue
-                i_remaining -= 1
-                dominance = _compare(a_ind, i_ind)
-                # invalidate the dominated individual 
-                # insert it into rank_B
-                # adjust rank occupancy
-                if dominance == LEFT_DOMINATES:
-                    rank_B, into = move_individual(
-                        rank_B, rank_B.occupancy, into, ii)
-                elif dominance == RIGHT_DOMINATES:
-                    rank_B, rank_A = move_individual(
-                        rank_B, rank_B.occupancy, rank_A, ai)
-                    # break if rank A individual was dominated and go
-                    # to next rank A individual
-                    break
+        for ai in _valid_indices(rank_A):
+            # print("processing {} from rank A".format(ai))
+            rank_A, into, rank_B = _sort_individual(rank_A, ai, into, rank_B)
         # print("after comparisons: rank {}".format(rank_into))
         # _print_rank(into)
         # print("after comparisons: rank_A")
@@ -126,6 +155,7 @@ def sort_into_archive(state, archive_individual):
         rank_B, rank_A = rank_A, rank_B
         # update the archive
         archive[rank_into] = into
+        rank_sizes[rank_into] = into.occupancy
 
         # print("after: rank {}".format(rank_into))
         # _print_rank(into)
@@ -137,54 +167,281 @@ def sort_into_archive(state, archive_individual):
         rank_into += 1
 
     # insert all remaining overflow in the last rank
-    last_rank = archive[-1]
+    last_rank = _reserve(
+        state, archive[-1], archive[-1].occupancy + rank_A.occupancy)
     last_rank, rank_A = fill_rank_from_rank(last_rank, rank_A)
     archive[-1] = last_rank
+    rank_sizes[-1] = last_rank.occupancy
 
     # if there's anything left in rank A, discard the grid points
     # from the archive set
     archive_set = state.archive_set
-    for arch_ind in rank_A.individuals:
-        if arch_ind.valid:
-            archive_set.difference_update((arch_ind.grid_point,))
+    for ai in _valid_indices(rank_A):
+        arch_ind = _individual(rank_A, ai)
+        key = encode_grid_point(state.grid, arch_ind.grid_point)
+        archive_set.discard(key)
+        if (state.coverage is not None
+                and key not in state.issued.issued_set):
+            uncover(state.coverage, key)
+
+    # Ranks never empty out, so the occupied ranks can only
+    # have grown past the old count.
+    occupied_ranks = state.archive_stats.occupied_ranks
+    while (occupied_ranks < len(rank_sizes)
+           and rank_sizes[occupied_ranks] > 0):
+        occupied_ranks += 1
+    archive_stats = ArchiveStats(
+        state.archive_stats.total_occupancy
+        + len(archive_individuals) - rank_A.occupancy,
+        occupied_ranks,
+        tuple(rank_sizes))
 
     state = state._replace(
         rank_A=rank_A,
         rank_B=rank_B,
         archive=archive,
-        archive_set=archive_set)
+        archive_set=archive_set,
+        archive_stats=archive_stats)
 
     return state
 
+def _archive_stats(archive):
+    """
+    Returns an ArchiveStats counting the individuals in
+    an archive, for an archive that didn't come from sorting.
+    """
+    rank_sizes = tuple(rank.occupancy for rank in archive)
+    occupied_ranks = 0
+    for size in rank_sizes:
+        if size == 0:
+            break
+        occupied_ranks += 1
+    return ArchiveStats(sum(rank_sizes), occupied_ranks, rank_sizes)
+
+def _sort_individual(rank_A, ai, into, rank_B):
+    """
+    Compare individual ai from rank A against every valid
+    individual in "into".  Individuals in "into" that it
+    dominates are displaced to rank B.  If it is dominated,
+    it is displaced to rank B itself and we stop comparing.
+
+    Returns updated rank A, "into", and rank B.
+    """
+    if isinstance(into, ArrayRank):
+        return sort_array_individual(rank_A, ai, into, rank_B)
+    a_ind = _individual(rank_A, ai)
+    # loop over rank being sorted into
+    for ii in _valid_indices(into):
+        dominance = _compare(a_ind, _individual(into, ii))
+        # invalidate the dominated individual 
+        # insert it into rank_B
+        # adjust rank occupancy
+        if dominance == LEFT_DOMINATES:
+            rank_B, into = move_individual(
+                rank_B, _free_slot(rank_B), into, ii)
+        elif dominance == RIGHT_DOMINATES:
+            rank_B, rank_A = move_individual(
+                rank_B, _free_slot(rank_B), rank_A, ai)
+            # break if rank A individual was dominated and go
+            # to next rank A individual
+            break
+    return rank_A, into, rank_B
+
+def _valid_indices(rank):
+    """
+    Returns a copy of the indices of the valid individuals in
+    a rank.
+    """
+    if isinstance(rank, ArrayRank):
+        return valid_array_indices(rank)
+    return rank.slots[:rank.occupancy]
+
+def _free_slot(rank):
+    """
+    Returns the index of the free slot on top of the free-slot
+    stack.  Don't call this on a full rank.
+    """
+    return rank.slots[rank.occupancy]
+
+def _individual(rank, index):
+    """
+    Returns the ArchiveIndividual in slot "index" of a rank.
+    """
+    if isinstance(rank, ArrayRank):
+        return array_rank_individual(rank, index)
+    return rank.individuals[index]
+
+def rank_capacity(rank):
+    """
+    Returns the number of individuals a rank can hold.
+    """
+    if isinstance(rank, ArrayRank):
+        return len(rank.valid)
+    return len(rank.individuals)
+
+def empty_rank(problem, float_values, ranksize):
+    """
+    problem (Problem)
+    float_values (RETAIN or DISCARD)
+    ranksize (int): number of slots in the rank
+
+    Returns a Rank full of bogus, invalid individuals.
+    """
+    # construct bogus individuals to fill the rank
+    bogus_grid_point = tuple((999 for _ in problem.decisions))
+    if float_values == RETAIN:
+        bogus_decisions = tuple((0.0 for _ in problem.decisions))
+    else:
+        bogus_decisions = tuple()
+    bogus_objectives = list()
+    # in C99, math.h has macros for infinity and nan
+    inf = float("inf")
+    ninf = -inf
+    # Bogus individuals should never dominate true individuals.
+    for objective in problem.objectives:
+        if objective.sense == MAXIMIZE:
+            bogus_objectives.append(ninf)
+        else:
+            bogus_objectives.append(inf)
+    # Nor should they appear even remotely feasible.
+    bogus_constraints = list()
+    for constraint in problem.constraints:
+        if constraint.sense == MAXIMIZE:
+            bogus_constraints.append(ninf)
+        else:
+            bogus_constraints.append(inf)
+    bogus_tagalongs = list((0.0 for _ in problem.tagalongs))
+    bogus_archive_individual = ArchiveIndividual(
+        False, # and bogus individuals are invalid
+        bogus_grid_point,
+        bogus_decisions,
+        bogus_objectives,
+        bogus_constraints,
+        bogus_tagalongs)
+    return Rank(
+        [bogus_archive_individual for _ in range(ranksize)],
+        0,
+        array('i', range(ranksize)),
+        array('i', range(ranksize)))
+
+def _reserve(state, rank, needed):
+    """
+    Grow a lazily allocated rank so it can hold at least
+    "needed" individuals, but never more than state.ranksize.
+    Capacity at least doubles every time it grows, so the
+    copying is spread thinly over the individuals stored.
+    Ranks allocated at full size are never touched.
+
+    Returns the rank, which is a new one if it had to grow.
+    """
+    capacity = rank_capacity(rank)
+    needed = min(needed, state.ranksize)
+    if needed <= capacity:
+        return rank
+    # 16 keeps the first few insertions from growing every time.
+    capacity = min(max(needed, 2 * capacity, 16), state.ranksize)
+    if isinstance(rank, ArrayRank):
+        return grow_array_rank(rank, capacity)
+    old_capacity = len(rank.individuals)
+    extension = empty_rank(
+        state.problem, state.float_values, capacity - old_capacity)
+    slots = array('i', rank.slots)
+    slots.extend(extension.slots)
+    positions = array('i', rank.positions)
+    positions.extend(extension.positions)
+    # The new slots go on the bottom of the free-slot stack.
+    for index in range(old_capacity, capacity):
+        slots[index] += old_capacity
+        positions[index] += old_capacity
+    return rank._replace(
+        individuals=rank.individuals + extension.individuals,
+        slots=slots,
+        positions=positions)
+
+def _clear_rank(rank):
+    if isinstance(rank, ArrayRank):
+        return clear_array_rank(rank)
+    individuals = rank.individuals
+    for index in rank.slots[:rank.occupancy]:
+        individuals[index] = individuals[index]._replace(valid=False)
+    return rank._replace(occupancy=0)
+
+def _store_individual(rank, archive_individual):
+    """
+    Put an ArchiveIndividual in the next free slot of a rank.
+    """
+    if isinstance(rank, ArrayRank):
+        return store_array_individual(rank, archive_individual)
+    rank.individuals[_free_slot(rank)] = archive_individual
+    # The top of the free stack is already at the boundary.
+    return rank._replace(occupancy=rank.occupancy + 1)
+
+def nondominated_fronts(archive_individuals):
+    """
+    archive_individuals (sequence of ArchiveIndividual)
+
+    Pareto sort a batch of individuals among themselves.
+    If two individuals share a grid point and neither
+    dominates the other, the later one wins, just as it would
+    if they were sorted into the archive one after the other.
+
+    Returns a list of fronts, best first.  Each front is a
+    list of indices into archive_individuals.
+    """
+    if numpy is not None:
+        return array_nondominated_fronts(
+            [a.objectives for a in archive_individuals],
+            [a.constraints for a in archive_individuals],
+            [a.grid_point for a in archive_individuals])
+    count = len(archive_individuals)
+    # dominates[ii] lists the individuals that ii dominates
+    dominates = [list() for _ in range(count)]
+    # dominated_by[jj] counts the individuals that dominate jj
+    dominated_by = [0 for _ in range(count)]
+    for ii in range(count):
+        for jj in range(ii + 1, count):
+            left = archive_individuals[jj]
+            right = archive_individuals[ii]
+            dominance = _compare(left, right)
+            if dominance == LEFT_DOMINATES:
+                dominates[jj].append(ii)
+                dominated_by[ii] += 1
+            elif dominance == RIGHT_DOMINATES:
+                dominates[ii].append(jj)
+                dominated_by[jj] += 1
+    fronts = list()
+    front = [ii for ii in range(count) if dominated_by[ii] == 0]
+    while front:
+        fronts.append(front)
+        next_front = list()
+        for ii in front:
+            for jj in dominates[ii]:
+                dominated_by[jj] -= 1
+                if dominated_by[jj] == 0:
+                    next_front.append(jj)
+        front = sorted(next_front)
+    # Tie-breaking can make dominance cyclic in pathological
+    # cases.  Don't lose anybody if it does.
+    leftover = [ii for ii in range(count) if dominated_by[ii] > 0]
+    if leftover:
+        fronts.append(leftover)
+    return fronts
+
 def _print_rank(rank):
     print("occupancy {}".format(rank.occupancy))
-    print("valid {}".format(sum((1 for i in rank.individuals if i.valid))))
-    ii = 0
-    valid = 0
-    while valid < rank.occupancy and ii < len(rank.individuals):
-        print(rank.individuals[ii])
-        if rank.individuals[ii].valid:
-            valid += 1
-        ii += 1
+    for ii in _valid_indices(rank):
+        print(_individual(rank, ii))
 
 def fill_rank_from_rank(destination, source):
-    di = 0
-    for si, s_ind in enumerate(source.individuals):
-        if source.occupancy <= 0:
-            break
-        if not s_ind.valid:
-            continue
-        if destination.occupancy >= len(destination.individuals):
-            break
-        while di < len(destination.individuals):
-            if destination.individuals[di].valid:
-                di += 1
-            else:
-                destination, source = move_individual(
-                    destination, di, source, si)
-                break
-        if di >= len(destination.individuals):
-            break
+    if isinstance(destination, ArrayRank):
+        return fill_array_rank_from_rank(destination, source)
+    # Moving the last valid individual to the top free slot
+    # doesn't disturb the order of either rank's slots.
+    capacity = len(destination.individuals)
+    while source.occupancy > 0 and destination.occupancy < capacity:
+        destination, source = move_individual(
+            destination, _free_slot(destination),
+            source, source.slots[source.occupancy - 1])
     return destination, source
 
 def move_individual(destination_rank, destination_index, source_rank, source_index):
@@ -195,20 +452,30 @@ def move_individual(destination_rank, destination_index, source_rank, source_ind
     occupancy accordingly.
 
     destination_rank (Rank)
-    destination_index (int): index into destination_rank
+    destination_index (int): index of a free slot in destination_rank
     source_rank (Rank)
     source_index (int): index into source_rank
 
     Returns an updated destination rank and source rank.
     """
+    if isinstance(destination_rank, ArrayRank):
+        return move_array_individual(
+            destination_rank, destination_index,
+            source_rank, source_index)
     individual = source_rank.individuals[source_index]
     destination_rank.individuals[destination_index] = individual
-    destination_rank = destination_rank._replace(
-        occupancy=destination_rank.occupancy + 1)
+    destination_rank = destination_rank._replace(occupancy=occupy_slot(
+        destination_rank.slots,
+        destination_rank.positions,
+        destination_rank.occupancy,
+        destination_index))
     source_rank.individuals[source_index] = individual._replace(
         valid=False)
-    source_rank = source_rank._replace(
-        occupancy=source_rank.occupancy - 1)
+    source_rank = source_rank._replace(occupancy=vacate_slot(
+        source_rank.slots,
+        source_rank.positions,
+        source_rank.occupancy,
+        source_index))
     return destination_rank, source_rank
 
 def _compare(left, right):
@@ -88,9 +88,27 @@ Individual = namedtuple("Individual", (
 # Rank: a set of individuals, none of which dominates any other
 # The Individual type itself will be defined at run-time, when
 # the Problem is provided to the library.
+# The slots and positions members index the rank; see Slots.py.
 Rank = namedtuple("Rank", (
     "individuals",  # list of individuals
-    "occupancy"     # number of valid individuals present
+    "occupancy",    # number of valid individuals present
+    "slots",        # valid slot indices, then a stack of free ones
+    "positions",    # position of each slot in slots
+))
+
+# ArrayRank: a Rank stored as contiguous arrays rather than as
+# a list of ArchiveIndividuals.  Row i of each array describes
+# the individual in slot i.  Requires numpy.
+ArrayRank = namedtuple("ArrayRank", (
+    "valid",        # bool array: whether each slot holds a valid individual
+    "grid_points",  # int matrix: one grid point per slot
+    "decisions",    # float matrix: zero columns unless RETAIN
+    "objectives",   # float matrix
+    "constraints",  # float matrix
+    "tagalongs",    # float matrix
+    "occupancy",    # number of valid individuals present
+    "slots",        # int array: valid slot indices, then free ones
+    "positions",    # int array: position of each slot in slots
 ))
 
 # DOE state: state of the ongoing DOE
@@ -99,6 +117,14 @@ DOEState = namedtuple("DOEState", (
     "terminate",    # CENTERPOINT, OFAT, CORNERS, COUNT
     "counter",      # int to keep track of where you are in the stage
     "remaining",    # int to keep track of the remaining COUNT
+    "permutation",  # a Permutation for RANDOM, or None for uniform draws
+))
+
+# Permutation: a seeded bijection on grid point keys, used to
+# visit the grid in random order without repeats
+Permutation = namedtuple("Permutation", (
+    "half_bits",    # width of each half of the Feistel network
+    "keys",         # a tuple of round keys
 ))
 
 # Axis: an axis of the sampling grid is a tuple of decision
@@ -112,25 +138,50 @@ Grid = namedtuple("Grid", (
     "deltas",       # a tuple of floats (to speed conversions)
     "GridPoint",    # a namedtuple type to use for the grid points
     "Sample",       # a namedtuple type to use for samples in decision space
+    "strides",      # a tuple of ints: place value of each axis in a key
 ))
 
-# Issue: a GridPoint, and an outstanding flag indicating whether that
-# GridPoint is still outstanding.
+# Issue: a grid point key, and an outstanding flag indicating whether
+# that grid point is still outstanding.
 Issue = namedtuple("Issue", (
-    "grid_point",   # a GridPoint
+    "key",          # a grid point key (see Sampling.encode_grid_point)
     "outstanding",  # whether the grid point represents an outstanding sample
 ))
 
 # Issued: rolling record of issued samples
-# The issued_set member is a cheat -- it breaks my
-# restriction on dynamic data structures.  This is ok
-# because we can do without it in the C version -- it's
+# The issued_set and issue_index members are cheats -- they
+# break my restriction on dynamic data structures.  This is ok
+# because we can do without them in the C version -- they're
 # just there to accelerate scans that are slow in the
 # first place because we're using Python.
 Issued = namedtuple("Issued", (
     "issues",       # a list of Issue
     "index",        # where we should write the next sample
-    "issued_set",   # set of outstanding grid points (Python acceleration)
+    "issued_set",   # set of outstanding grid point keys (Python acceleration)
+    "issue_index",  # dict of outstanding grid point key -> index into issues
+))
+
+# ArchiveStats: running counts of the archive's contents,
+# kept up to date by sorting so they can be read for free.
+ArchiveStats = namedtuple("ArchiveStats", (
+    "total_occupancy",  # number of individuals in the archive
+    "occupied_ranks",   # number of ranks before the first empty one
+    "rank_sizes",       # a tuple of the occupancy of each rank
+))
+
+# Throughput: how fast a parallel run evaluated samples
+Throughput = namedtuple("Throughput", (
+    "evaluations",             # number of individuals evaluated
+    "seconds",                 # wall clock time of the run
+    "evaluations_per_second",  # evaluations / seconds
+))
+
+# Coverage: a bitmap of the sampled grid points, by key.
+# See Coverage.py.
+Coverage = namedtuple("Coverage", (
+    "chunks",       # a list of bytearrays, None (empty), or FULL
+    "counts",       # a list of the number of bits set in each chunk
+    "total_points", # number of grid points
 ))
 
 # Algorithm state at some point in time.
@@ -144,11 +195,16 @@ MOEAState = namedtuple("MOEAState", (
     "float_values",        # RETAIN or DISCARD floating point decision values
     "grid",                # a Grid
     "archive",             # a list of Ranks
-    "archive_set",         # a set of returned grid points for Python acceleration
+    "ranksize",            # maximum number of individuals in a Rank
+    "archive_set",         # a set of returned grid point keys for Python acceleration
+    "archive_stats",       # an ArchiveStats
     "rank_A",              # an extra Rank, needed for sorting
     "rank_B",              # an extra Rank, needed for sorting
     "issued",              # an Issued structure
     "random",              # real-valued [0,1) RNG
     "randint",             # integer-valued [a, b] RNG
+    "distribution_index",  # SBX distribution index
     "doestate",            # a DOEState
+    "selection_tables",    # a dict of cached rank selection tables for Python acceleration
+    "coverage",            # a Coverage, or None
 ))
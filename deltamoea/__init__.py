@@ -37,6 +37,8 @@ POSSIBILITY OF SUCH DAMAGE.
 
 __all__ = ["Constants", "Structures", "Functions"]
 
+import sys
+
 from .Constants import MAXIMIZE
 from .Constants import MINIMIZE
 from .Constants import CENTERPOINT
@@ -44,8 +46,15 @@ from .Constants import OFAT
 from .Constants import CORNERS
 from .Constants import RANDOM
 from .Constants import COUNT
+from .Constants import UNIFORM
+from .Constants import PERMUTATION
 from .Constants import RETAIN
 from .Constants import DISCARD
+from .Constants import LISTS
+from .Constants import ARRAYS
+from .Constants import MEMMAP
+from .Constants import EAGER
+from .Constants import LAZY
 
 from .Structures import Decision
 from .Structures import Objective
@@ -55,15 +64,44 @@ from .Structures import Problem
 from .Structures import ArchiveIndividual
 from .Structures import Individual
 from .Structures import Rank
+from .Structures import ArrayRank
 from .Structures import MOEAState
+from .Structures import ArchiveStats
+from .Structures import Throughput
 
 from .Functions import create_moea_state
 from .Functions import doe
 from .Functions import return_evaluated_individual
+from .Functions import return_evaluated_individuals
 from .Functions import get_sample
+from .Functions import get_samples
 from .Functions import get_iterator
+from .Functions import archive_stats
+from .Functions import grid_coverage
 from .Functions import decisions_to_grid_point
 
+from .Generators import BufferedRNG
+
+from .Checkpoint import save_state
+from .Checkpoint import load_state
+
+from .Optimizer import Optimizer
+from .Prefetch import Prefetcher
+
+from .Parallel import optimize_in_pool
+
+from .Islands import optimize_islands
+from .Islands import merge_archives
+
+from .Server import SampleServer
+from .Server import SampleClient
+from .Server import run_worker
+
+if sys.version_info >= (3, 5):
+    from .Asynchronous import optimize_async
+
 from .Sampling import NearExhaustionWarning
 from .Sampling import TotalExhaustionError
+from .Sampling import encode_grid_point
+from .Sampling import decode_grid_point
 
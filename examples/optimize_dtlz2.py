@@ -59,6 +59,7 @@ from deltamoea import doe
 from deltamoea import get_sample
 from deltamoea import return_evaluated_individual
 from deltamoea import get_iterator
+from deltamoea import archive_stats
 
 from deltamoea import NearExhaustionWarning
 from deltamoea import TotalExhaustionError
@@ -170,12 +171,7 @@ def run_experiment(runtime_file, rotation_seed, dmoea_seed, nfe):
             "{:.4f}".format(o) for o in individual.objectives]
         ))
         print("{}".format(",".join(record)))
-    rank_sizes = dict((ii, 0) for ii in range(len(state.archive)))
-    for ii in range(len(state.archive)):
-        # the proposed C approach is very non-Pythonic, so we use a
-        # generator here
-        for individual in get_iterator(state, ii):
-            rank_sizes[ii] += 1
+    rank_sizes = archive_stats(state).rank_sizes
     # Print rank sizes to stderr
     for ii in range(len(state.archive)):
         sys.stderr.write("{}\t{}\n".format(ii, rank_sizes[ii]))
@@ -0,0 +1,111 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Optimize DTLZ2 with the asyncio driver, as if each evaluation
+were a slow call to a remote simulation service.
+
+python -m examples.optimize_dtlz2_async 0 1000 16 > result.csv
+"""
+
+import argparse
+import asyncio
+import random
+
+from deltamoea import MINIMIZE
+
+from deltamoea import Decision
+from deltamoea import Objective
+from deltamoea import Problem
+from deltamoea import Individual
+
+from deltamoea import create_moea_state
+from deltamoea import optimize_async
+from deltamoea import get_iterator
+
+from problems.problems import dtlz2
+
+def run_experiment(dmoea_seed, nfe, concurrency):
+    random.seed(dmoea_seed)
+    ndv = 10
+    nobj = 2
+    evaluate = dtlz2(ndv, nobj)
+
+    decisions = tuple(
+        Decision("decision{}".format(ii), 0.0, 1.0, 0.01)
+        for ii in range(ndv))
+    objectives = tuple(
+        Objective("objective{}".format(ii), MINIMIZE)
+        for ii in range(nobj))
+    problem = Problem(decisions, objectives, tuple(), tuple())
+
+    state = create_moea_state(problem, ranks=100, ranksize=1000)
+
+    async def evaluate_remotely(dvs):
+        # Stand-in for waiting on a simulation service.
+        await asyncio.sleep(0.01 * random.random())
+        return Individual(dvs, evaluate(dvs), tuple(), tuple())
+
+    # asyncio.run needs Python 3.7, and the driver only needs 3.5.
+    loop = asyncio.new_event_loop()
+    try:
+        state = loop.run_until_complete(
+            optimize_async(state, evaluate_remotely, nfe, concurrency))
+    finally:
+        loop.close()
+
+    # Print rank 0
+    print(",".join(
+        ["decision{}".format(d) for d in range(ndv)] +
+        ["objective{}".format(o) for o in range(nobj)]))
+    for individual in get_iterator(state, 0):
+        print(",".join(
+            ["{:.4f}".format(d) for d in individual.decisions] +
+            ["{:.4f}".format(o) for o in individual.objectives]))
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dmoea_seed", type=int, help="seed for DMOEA's RNG")
+    parser.add_argument("NFE", type=int, help="length of run")
+    parser.add_argument("concurrency", type=int,
+                        help="number of evaluations in flight at once")
+    args = parser.parse_args()
+
+    run_experiment(args.dmoea_seed, args.NFE, args.concurrency)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,126 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Optimize rotated DTLZ2 with its evaluations spread over a
+pool of worker processes.
+
+python -m examples.optimize_dtlz2_pool 0 0 10000 > result.csv
+"""
+
+import sys
+import argparse
+import random
+
+from deltamoea import MINIMIZE
+
+from deltamoea import Decision
+from deltamoea import Objective
+from deltamoea import Problem
+from deltamoea import Individual
+
+from deltamoea import create_moea_state
+from deltamoea import optimize_in_pool
+from deltamoea import get_iterator
+
+from problems.problems import dtlz2_rotated
+
+NDV = 100
+NOBJ = 2
+
+def make_evaluator(rotation_seed):
+    """
+    Runs once in each worker process.  Seeding here means
+    every worker gets the same rotation.
+    """
+    random.seed(rotation_seed)
+    evaluate = dtlz2_rotated(NDV, NOBJ)
+    def evaluator(dvs):
+        return Individual(dvs, evaluate(dvs), tuple(), tuple())
+    return evaluator
+
+def run_experiment(rotation_seed, dmoea_seed, nfe, processes, batch_size):
+    random.seed(dmoea_seed)
+    decisions = tuple(
+        Decision("decision{}".format(ii), 0.0, 1.0, 0.1)
+        for ii in range(NDV))
+    objectives = tuple(
+        Objective("objective{}".format(ii), MINIMIZE)
+        for ii in range(NOBJ))
+    problem = Problem(decisions, objectives, tuple(), tuple())
+
+    state = create_moea_state(problem, ranks=100, ranksize=10000)
+
+    state, throughput = optimize_in_pool(
+        state, make_evaluator, nfe,
+        factory_args=(rotation_seed,),
+        processes=processes,
+        batch_size=batch_size)
+    sys.stderr.write("{} evaluations in {:.1f} s: {:.0f} per second\n".format(
+        throughput.evaluations,
+        throughput.seconds,
+        throughput.evaluations_per_second))
+
+    # Print rank 0
+    print(",".join(
+        ["decision{}".format(d) for d in range(NDV)] +
+        ["objective{}".format(o) for o in range(NOBJ)]))
+    for individual in get_iterator(state, 0):
+        print(",".join(
+            ["{:.4f}".format(d) for d in individual.decisions] +
+            ["{:.4f}".format(o) for o in individual.objectives]))
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rotation_seed", type=int, help="seed for generating a random rotation matrix for dtlz2")
+    parser.add_argument("dmoea_seed", type=int, help="seed for DMOEA's RNG")
+    parser.add_argument("NFE", type=int, help="length of run")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="samples per task sent to a worker")
+    args = parser.parse_args()
+
+    run_experiment(
+        args.rotation_seed,
+        args.dmoea_seed,
+        args.NFE,
+        args.processes,
+        args.batch_size)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,145 @@
+"""
+Copyright (c) 2018 DecisionVis, LLC. All rights reserved.
+
+Redistribution and use in source and binary forms, with
+or without modification, are permitted provided that the
+following conditions are met:
+
+1. Redistributions of source code must retain the above
+copyright notice, this list of conditions and the following
+disclaimer.
+
+2. Redistributions in binary form must reproduce the
+above copyright notice, this list of conditions and the
+following disclaimer in the documentation and/or other
+materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names
+of its contributors may be used to endorse or promote
+products derived from this software without specific prior
+written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND
+CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES,
+INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER
+OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE
+GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+POSSIBILITY OF SUCH DAMAGE.
+"""
+
+"""
+Tests for the sample server.  Run with
+    python -m unittest discover tests
+"""
+
+import socket
+import threading
+import unittest
+
+from deltamoea import Decision
+from deltamoea import Individual
+from deltamoea import MINIMIZE
+from deltamoea import Objective
+from deltamoea import Problem
+from deltamoea import SampleClient
+from deltamoea import SampleServer
+from deltamoea import create_moea_state
+
+RING = 10
+
+def _problem():
+    return Problem(
+        decisions=tuple(
+            Decision("x{}".format(ii), 0.0, 1.0, 0.01) for ii in range(3)),
+        objectives=(Objective("a", MINIMIZE), Objective("b", MINIMIZE)),
+        constraints=(),
+        tagalongs=())
+
+def _evaluate(sample):
+    return Individual(tuple(sample), (sample[0], 1.0 - sample[0]), (), ())
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = SampleServer(
+            create_moea_state(_problem(), ranksize=RING), ("127.0.0.1", 0))
+        self.thread = None
+        self.clients = list()
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        if self.thread is not None:
+            self.thread.join(5.0)
+        self.server.close()
+
+    def _serve(self, **kwargs):
+        kwargs.setdefault("timeout", 1.0)
+        self.thread = threading.Thread(
+            target=self.server.serve, kwargs=kwargs)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _client(self):
+        client = SampleClient(self.server.address)
+        client.socket.settimeout(5.0)
+        self.clients.append(client)
+        return client
+
+    def _assert_no_reply(self, client):
+        client.socket.settimeout(0.2)
+        with self.assertRaises(socket.timeout):
+            client.receive_ask()
+        client.socket.settimeout(5.0)
+
+    def _assert_ring_holds_outstanding(self):
+        issued = self.server.state.issued
+        for key in self.server._outstanding:
+            self.assertIn(key, issued.issue_index)
+            self.assertTrue(issued.issues[issued.issue_index[key]].outstanding)
+
+    def test_out_of_order_tells_do_not_overwrite(self):
+        self._serve()
+        client = self._client()
+        samples = client.ask(RING)
+        self.assertEqual(len(samples), RING)
+        # Tell all but the first, which still holds the next slot
+        # in the ring.
+        client.tell([_evaluate(sample) for sample in samples[1:]])
+        client.send_ask(RING - 1)
+        self._assert_no_reply(client)
+        self._assert_ring_holds_outstanding()
+        client.send_tell([_evaluate(samples[0])])
+        self.assertEqual(len(client.receive_ask()), RING - 1)
+        self.assertEqual(client.receive_tell(), 1)
+        self._assert_ring_holds_outstanding()
+
+    def test_drop_answers_waiting_asks(self):
+        self._serve()
+        first = self._client()
+        second = self._client()
+        self.assertEqual(len(first.ask(RING)), RING)
+        second.send_ask(RING)
+        self._assert_no_reply(second)
+        first.close()
+        self.assertEqual(len(second.receive_ask()), RING)
+
+    def test_drop_after_stop_finishes(self):
+        self._serve(evaluations=RING, timeout=None)
+        first = self._client()
+        second = self._client()
+        self.assertEqual(len(first.ask(RING)), RING)
+        self.assertEqual(second.ask(RING), [])
+        first.close()
+        self.thread.join(5.0)
+        self.assertFalse(self.thread.is_alive())
+
+if __name__ == "__main__":
+    unittest.main()